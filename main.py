@@ -1,3 +1,4 @@
+import asyncio
 import pathlib
 from contextlib import asynccontextmanager
 
@@ -9,11 +10,21 @@ from fastapi.responses import ORJSONResponse
 from loguru import logger
 
 import routers
+from utils import bus, calc, ci, clients, metrics, mirror, monitor, timeseries, trace, weather
 from utils.config import config
 from utils.db import init_db
+from utils.index import index
+from utils.store import store
+from utils.schedule import finish
 
 scheduler = BackgroundScheduler()
 
+def run_in_loop(loop: asyncio.AbstractEventLoop, coro_func):
+    """
+    APScheduler 的任务运行在后台线程中，协程任务需提交到主事件循环执行
+    """
+    asyncio.run_coroutine_threadsafe(coro_func(), loop)
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     logger.add(
@@ -24,12 +35,45 @@ async def lifespan(_: FastAPI):
     )
     logger.info("程序加载中：初始化 SQLite 数据库")
     init_db('./data/records.db')
+    logger.info("程序加载中：读取持久化统计")
+    timeseries.init()
+    routers.web.statistic.load_statistic()
+    logger.info("程序加载中：预加载节假日与调休数据")
+    await asyncio.to_thread(calc.compensation_index)
+    logger.info("程序加载中：预热城市 ID 缓存")
+    await weather.cache.warm()
+    logger.info("程序加载中：建立目录索引")
+    await index.get()
     logger.info("程序加载中：添加定时任务")
+    loop = asyncio.get_running_loop()
     scheduler.add_job(routers.web.statistic.reset_statistic, "cron", hour=0, minute=0)
+    scheduler.add_job(run_in_loop, "interval", seconds=config.stats.flush_interval, args=[loop, timeseries.flush])
+    scheduler.add_job(run_in_loop, "interval", seconds=config.stats.flush_interval, args=[loop, weather.cache.flush])
+    scheduler.add_job(run_in_loop, "cron", hour=0, minute=10, args=[loop, timeseries.prune])
+    scheduler.add_job(run_in_loop, "cron", hour=0, minute=0, second=5, args=[loop, finish.refresh_connected])
+    if config.weather.prefetch_interval > 0:
+        scheduler.add_job(
+            run_in_loop, "interval", seconds=config.weather.prefetch_interval, args=[loop, weather.prefetch]
+        )
+    # 兜底发现手动对 ./data/ 目录的改动
+    scheduler.add_job(run_in_loop, "interval", minutes=1, args=[loop, index.rescan])
+    if config.ci.refresh_interval > 0:
+        scheduler.add_job(run_in_loop, "interval", seconds=config.ci.refresh_interval, args=[loop, mirror.refresh])
     logger.info("程序加载中：启动定时任务")
     scheduler.start()
     logger.info("程序加载中：设置工作目录")
     pathlib.Path("./data/").mkdir(parents=True, exist_ok=True)
+    logger.info("程序加载中：创建 HTTP 连接池")
+    await clients.init()
+    logger.info("程序加载中：读取构建信息缓存")
+    ci.load_state()
+    # 后台验证构建信息并镜像构建产物，不阻塞启动；保留引用，避免任务在完成前被回收
+    mirror_task = asyncio.create_task(mirror.refresh())
+    mirror_task.add_done_callback(mirror._log_error)
+    logger.info("程序加载中：启动事件总线")
+    await bus.start()
+    logger.info("程序加载中：启动事件循环监控")
+    monitor.start()
     logger.success(
         r"""
         FastClassSchedule 加载成功
@@ -42,8 +86,21 @@ async def lifespan(_: FastAPI):
         """
     )
     yield
-    logger.info("程序关闭中：关闭定时任务 (1/1)")
+    logger.info("程序关闭中：关闭定时任务与事件循环监控 (1/5)")
     scheduler.shutdown()
+    mirror_task.cancel()
+    await monitor.stop()
+    logger.info("程序关闭中：关闭事件总线 (2/5)")
+    await bus.stop()
+    logger.info("程序关闭中：关闭 HTTP 连接池 (3/5)")
+    await clients.close()
+    logger.info("程序关闭中：写入未保存的配置并关闭配置存储 (4/5)")
+    await store.flush()
+    store.close()
+    logger.info("程序关闭中：写入统计数据 (5/5)")
+    await timeseries.flush()
+    await weather.cache.flush()
+    timeseries.close()
     logger.success(
         r"""
         FastClassSchedule 即将关闭
@@ -67,14 +124,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+logger.info("程序加载中：设置请求指标与分段计时")
+app.add_middleware(trace.TraceMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 logger.info("程序加载中：导入课程表相关 API")
-app.include_router(routers.client.schedule.router)
 app.include_router(routers.client.update.router)
 app.include_router(routers.client.weather.router)
+app.include_router(routers.client.versions.router)
 app.include_router(routers.web.statistic.router)
 app.include_router(routers.web.config.router)
 app.include_router(routers.web.autorun.router)
 app.include_router(routers.web.schedule.router)
+app.include_router(routers.web.metrics.router)
+app.include_router(routers.web.profile.router)
+# /{school}/{grade}/{class_number} 会匹配任意三段路径，需放在最后，避免遮蔽 /api/weather/{name} 等路由
+app.include_router(routers.client.schedule.router)
 
 @app.get("/", response_class=ORJSONResponse)
 async def root():
@@ -82,4 +146,13 @@ async def root():
 
 
 if __name__ == '__main__':
-    uvicorn.run(app, host=config.server.host, port=config.server.port)
+    workers = config.server.workers
+    if workers > 1 and not config.cluster.enabled:
+        # 未开启 [cluster] 时各 worker 无法互通事件，配置变更与统计信息会在 worker 间不一致
+        logger.error(f"已配置 {workers} 个 worker 但未开启 [cluster]，将以单 worker 启动")
+        workers = 1
+    if workers > 1:
+        # 多 worker 需以导入字符串启动
+        uvicorn.run("main:app", host=config.server.host, port=config.server.port, workers=workers)
+    else:
+        uvicorn.run(app, host=config.server.host, port=config.server.port)
@@ -1,3 +1,4 @@
 from . import schedule
 from . import update
-from . import weather
\ No newline at end of file
+from . import weather
+from . import versions
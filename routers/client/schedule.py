@@ -1,16 +1,21 @@
+import asyncio
 import datetime
-import json
-import pathlib
+import math
+import time
 from typing import Annotated
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from fastapi import Depends, WebSocket, WebSocketDisconnect
 from fastapi.responses import ORJSONResponse
 from loguru import logger
 
-from routers.web.statistic import statistic
+from routers.web.statistic import record_disconnect
+from utils import bus, trace, versions
+from utils.metrics import schedule_stage_duration
 from utils.globalvar import websocket_clients
-from utils.schedule import run_all
+from utils.refresh import planner, Overloaded
+from utils.schedule import run_all, finish
+from utils.store import store
 from utils.verify import get_current_identity
 from utils.ws import ConnectionManager
 
@@ -18,94 +23,103 @@ router = APIRouter()
 
 @router.get("/{school}/{grade}/{class_number}", response_class=ORJSONResponse)
 async def get_schedule(
+        request: Request,
         school: str,
         grade: int,
         class_number: int
 ):
     """
-    获取指定学校、年级、班级的课表
+    获取指定学校、年级、班级的课表（输入未变化时根据 If-None-Match 返回 304）
+    :param request: 请求对象
     :param school: 学校编号 / 名称
     :param grade: 年级
     :param class_number: 班级
     :return: 相应的课表配置文件
     """
     logger.info(f"获取 {school} 学校 {grade} 级 {class_number} 班的配置文件")
-    return ORJSONResponse(
-        await run_all(
-            {
-                **json.loads(
-                    pathlib.Path(f"./data/{school}/{grade}/subjects.json").read_text()
-                ),
-                **json.loads(
-                    pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text()
-                ),
-                **json.loads(
-                    pathlib.Path(f"./data/{school}/{grade}/{class_number}/config.json").read_text()
-                ),
-                **json.loads(
-                    pathlib.Path(f"./data/{school}/{grade}/{class_number}/schedule.json").read_text()
-                )
-            },
-            school=school,
-            grade=grade,
-            class_number=class_number
+    with trace.span("versions"):
+        etag = f'"{(await asyncio.to_thread(versions.class_versions, school, grade, class_number))["hash"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    queued = time.perf_counter()
+    try:
+        async with planner.admit():
+            trace.add("queue", queued)
+            response = await _build_schedule(school, grade, class_number)
+            response.headers["ETag"] = etag
+            return response
+    except Overloaded as err:
+        logger.warning(f"课表生成排队超时，拒绝 {school} 学校 {grade} 级 {class_number} 班的请求：{err}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务器繁忙，请稍后重试",
+            headers={"Retry-After": str(max(1, math.ceil(err.retry_after)))}
         )
-    )
+
+
+def _read_schedule_sync(school: str, grade: int, class_number: int) -> dict:
+    """
+    同步实现：读取课表所需的文档（SQLite 后端或写缓冲未命中时会读磁盘）
+    """
+    return {
+        **store.read("subjects", school, grade),
+        **store.read("timetable", school, grade),
+        **store.read("config", school, grade, class_number),
+        **store.read("schedule", school, grade, class_number)
+    }
+
+
+async def _build_schedule(school: str, grade: int, class_number: int) -> ORJSONResponse:
+    with trace.span("read", schedule_stage_duration):
+        schedule = await asyncio.to_thread(_read_schedule_sync, school, grade, class_number)
+    result = await run_all(schedule, school=school, grade=grade, class_number=class_number)
+    with trace.span("render", schedule_stage_duration):
+        return ORJSONResponse(result)
 
 @router.websocket("/ws/{school}/{grade}/{class_number}")
-async def websocket_endpoint(websocket: WebSocket, school: str, grade: int, class_number: int):
+async def websocket_endpoint(websocket: WebSocket, school: str, grade: int, class_number: int, protocol: int = 1):
     """
     WebSocket 连接
     :param websocket: WebSocket 对象
     :param school: 学校编号 / 名称
     :param grade: 年级
     :param class_number: 班级
+    :param protocol: 消息协议版本，2 表示消息为 JSON 且 SyncConfig 附带刷新延迟
     :return:
     """
     try:
         await websocket_clients[(school, grade)].connect(
-            websocket, school, grade, class_number
+            websocket, school, grade, class_number, protocol=protocol
         )
     except KeyError:
         websocket_clients[(school, grade)] = ConnectionManager()
         await websocket_clients[(school, grade)].connect(
-            websocket, school, grade, class_number
+            websocket, school, grade, class_number, protocol=protocol
         )
     logger.info(f"来自 {school} 学校 {grade} 级 {class_number} 班的 WebSocket 连接建立")
+    # 配置变更时会主动刷新，连接时只需补上缺失的班级
+    await finish.lookup(school, grade, class_number)
     try:
         while True:
             data = await websocket.receive_text()
             logger.info(f"Received data: {data}")
     except WebSocketDisconnect:
-        schedule = {
-            **json.loads(
-                pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text()
-            ),
-            **json.loads(
-                pathlib.Path(f"./data/{school}/{grade}/{class_number}/schedule.json").read_text()
-            )
-        }
         now = datetime.datetime.now()
-        class_finish_time = datetime.time().fromisoformat(
-            list(
-                schedule["timetable"][
-                    schedule["daily_class"][
-                        now.isoweekday() % 7  # 星期日为 0，星期六为 6
-                    ]["timetable"]
-                ].keys()
-            )[-1].split("-")[0]
-        )
-        if now.time() < class_finish_time and not websocket_clients[(school, grade)].get_class_object(websocket).debug:
-            try:
-                statistic["websocket_disconnect"] [f"{school} 学校 {grade} 级 {class_number} 班"] += 1
-            except KeyError:
-                statistic["websocket_disconnect"] [f"{school} 学校 {grade} 级 {class_number} 班"] = 1
+        class_finish_time = await finish.lookup(school, grade, class_number)
+        if (
+            class_finish_time is not None
+            and now.time() < class_finish_time
+            and not websocket_clients[(school, grade)].get_class_object(websocket).debug
+        ):
+            count = await record_disconnect(school, grade, class_number)
             logger.warning(
                 f"现在 {school} 学校 {grade} 级 {class_number} 班还未放学，但连接异常断开，"
-                f"本班级今日已异常断开 {statistic['websocket_disconnect'] [f'{school} 学校 {grade} 级 {class_number} 班']} 次"
+                f"本班级今日已异常断开 {count} 次"
             )
         websocket_clients[(school, grade)].disconnect(websocket)
         logger.info(f"来自 {school} 学校 {grade} 级 {class_number} 班的 WebSocket 连接断开")
+        if (school, grade, class_number) not in websocket_clients[(school, grade)].class_map:
+            finish.discard(school, grade, class_number)
         if not websocket_clients[(school, grade)].active_connections:
             del websocket_clients[(school, grade)]
             logger.info(f"现在 {school} 学校 {grade} 级没有存活的 WebSocket 连接，已清除该连接管理器")
@@ -127,8 +141,5 @@ async def broadcast_message(
     :return: Json，表示成功
     """
     logger.info(f"收到来自 {school} 学校 {grade} 级 {class_number} 班的广播请求，即将向级部广播 SyncConfig 事件，{identity}")
-    try:
-        await websocket_clients[(school, grade)].broadcast("SyncConfig")
-    except KeyError:
-        logger.warning(f"没有找到对应的websocket连接：{school} {grade}")
+    await bus.broadcast(school, grade, "SyncConfig")
     return {"status": 200, "message": "SyncConfig"}
\ No newline at end of file
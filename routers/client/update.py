@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
 
-from utils import ci
+from fastapi import APIRouter, HTTPException, Path, Query, Request, status
+from fastapi.responses import FileResponse
+
+from utils import ci, mirror
 from utils.config import config
 
 router = APIRouter()
 
 @router.get("/api/update")
-async def api_update():
+async def api_update(
+    request: Request,
+    from_: Annotated[str | None, Query(alias="from", pattern=r"^\d{8}$")] = None,
+    from_build: Annotated[int | None, Query(alias="fromBuild", ge=1)] = None,
+):
     match config.ci.kind:
         case "jenkins":
-            return await ci.get_from_jenkins(config.ci.url, config.ci.filename)
+            build = await ci.get_from_jenkins(config.ci.url, config.ci.filename)
+            return {**build, **mirror.resolve(build, str(request.base_url), from_, from_build)}
         case _:
-            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="未适配此 CI 类型")
\ No newline at end of file
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="未适配此 CI 类型")
+
+@router.get("/api/update/artifact/{number}/{filename}")
+async def api_update_artifact(number: Annotated[int, Path(ge=1)], filename: str):
+    path = mirror.artifact_file(number, filename)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="该构建未镜像")
+    # FileResponse 自带 ETag / Last-Modified，并支持 Range 断点续传
+    return FileResponse(path, filename=filename, media_type="application/zip")
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from utils import versions
+
+router = APIRouter()
+
+@router.get("/versions", response_class=ORJSONResponse)
+def get_versions():
+    """
+    所有配置文档与自动任务作用域的内容哈希及版本号
+    """
+    return ORJSONResponse(versions.all_versions())
+
+@router.get("/versions/{school}/{grade}/{class_number}", response_class=ORJSONResponse)
+def get_class_versions(school: str, grade: int, class_number: int):
+    """
+    某班级课表所依赖输入的版本信息，hash 不变时课表内容不变
+    """
+    return ORJSONResponse(versions.class_versions(school, grade, class_number))
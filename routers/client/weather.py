@@ -1,13 +1,59 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, HTTPException, status, Body
 from fastapi.responses import ORJSONResponse
 from loguru import logger
 
-from routers.web.statistic import statistic
+from routers.web.statistic import record_weather_error
 from utils import weather
 from utils.config import config
+from utils.schedule.dataclasses import WeatherCity
 
 router = APIRouter()
 
+@router.post("/api/weather/batch", response_class=ORJSONResponse)
+async def weather_batch(cities: list[WeatherCity] = Body(embed=True)):
+    """
+    批量获取多个城市的天气，某个城市失败不影响其他城市
+    :param cities: 城市列表，如 [{"province": "北京", "name": "北京"}]
+    :return: 与请求顺序一致的结果列表，每项包含 status（200 / 404 / 502）
+    """
+    if len(cities) > config.weather.batch_limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多查询 {config.weather.batch_limit} 个城市"
+        )
+    semaphore = asyncio.Semaphore(config.weather.batch_concurrency)
+
+    async def fetch(name: str, province: str | None) -> dict:
+        async with semaphore:
+            try:
+                report = await weather.cached_weather_report(
+                    name=name,
+                    adm=province,
+                    host=config.apikey.apihost,
+                    key=config.apikey.weather
+                )
+                return {"status": 200, **report}
+            except KeyError:
+                return {"status": 404, "error": "不存在"}
+            except Exception as err:
+                logger.error(f"批量获取 {province}/{name} 的天气信息失败：{err!r}")
+                await record_weather_error()
+                return {"status": 502, "error": "获取天气信息失败"}
+
+    keys = list(dict.fromkeys((c.name, c.province or None) for c in cities))  # 去重并保持顺序
+    results = dict(zip(keys, await asyncio.gather(*(fetch(name, province) for name, province in keys))))
+    logger.info(f"批量获取 {len(keys)} 个城市的天气信息")
+    return ORJSONResponse(
+        {
+            "data": [
+                {"name": c.name, "province": c.province, **results[(c.name, c.province or None)]}
+                for c in cities
+            ]
+        }
+    )
+
 @router.get("/api/weather/{province}/{name}", response_class=ORJSONResponse)
 @router.get("/api/weather/{name}", response_class=ORJSONResponse)
 async def weather_province_name(name: str, province: str = None):
@@ -17,34 +63,25 @@ async def weather_province_name(name: str, province: str = None):
     :param province: 省份名称
     :return: 温度与天气
     """
-    for _ in range(5):
-        try:
-            resp = await weather.weather_lookup_by_name(
-                name=name,
-                adm=province,
-                host=config.apikey.apihost,
-                key=config.apikey.weather
-            )
-            warn_resp = await weather.weather_warning_lookup_by_name(
-                name=name,
-                adm=province,
-                host=config.apikey.apihost,
-                key=config.apikey.weather
-            )
-            warn = '；'.join([x['text'] for x in warn_resp['warning']]).replace('\n', '')
-            brief_warn = '；'.join([x['title'] for x in warn_resp['warning']]).replace('\n', '')
-            temp = resp['now']['temp']
-            weat = resp['now']['text']
-            logger.info(f"获取 {province}/{name} 的天气信息，T: {temp}, W: {weat}, Warning: {warn}, Brief: {brief_warn}")
-            return ORJSONResponse({"temp": temp, "weat": weat, 'warn': warn, 'brief_warn': brief_warn})
-        except KeyError:
-            logger.error(f"不存在 {province}/{name} ")
-            return ORJSONResponse({"temp": 404, "weat": "不存在", "warning": '', 'brief_warn': ''}, status_code=status.HTTP_404_NOT_FOUND)
-        except Exception as err:
-            logger.exception(f"获取天气信息失败: {err}", exc_info=True)
-    statistic['weather_error'] += 1
-    logger.error(f"获取 {province}/{name} 的天气信息失败，超过最大重试次数")
+    try:
+        report = await weather.cached_weather_report(
+            name=name,
+            adm=province,
+            host=config.apikey.apihost,
+            key=config.apikey.weather
+        )
+        logger.info(
+            f"获取 {province}/{name} 的天气信息，T: {report['temp']}, W: {report['weat']}, "
+            f"Warning: {report['warn']}, Brief: {report['brief_warn']}"
+        )
+        return ORJSONResponse(report)
+    except KeyError:
+        logger.error(f"不存在 {province}/{name} ")
+        return ORJSONResponse({"temp": 404, "weat": "不存在", "warning": '', 'brief_warn': ''}, status_code=status.HTTP_404_NOT_FOUND)
+    except Exception as err:
+        logger.error(f"获取 {province}/{name} 的天气信息失败：{err!r}")
+    await record_weather_error()
     raise HTTPException(
         status_code=status.HTTP_502_BAD_GATEWAY,
         detail="获取天气信息失败，超过最大重试次数，可能是上游服务器异常，或是本服务器存在网络波动"
-    )
\ No newline at end of file
+    )
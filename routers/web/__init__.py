@@ -2,3 +2,5 @@ from . import autorun
 from . import config
 from . import schedule
 from . import statistic
+from . import metrics
+from . import profile
@@ -13,7 +13,7 @@ from utils.autorun import (
     map_row,
     parse_scope_value,
 )
-from utils.calc import compensation_from_holiday, compensation_from_workday, compensation_pairs
+from utils.calc import compensation_from_holiday, compensation_from_workday, compensation_pairs, compensation_index
 from utils.db import fetch_records, delete_record, upsert_record, refresh_statuses
 from utils.schedule.dataclasses import AutorunType
 from utils.verify import get_current_identity
@@ -97,6 +97,26 @@ def get_compensation_pairs(year: int):
     }
 
 
+@router.get('/web/autorun/compensation/range')
+def get_compensation_range(start: datetime.date, end: datetime.date):
+    """获取 [start, end] 内的所有节假日、补班日与调休配对，供管理端日历视图一次性渲染"""
+    if end < start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='end 不能早于 start')
+    if (end - start).days > 366:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='查询范围不能超过一年')
+    index = compensation_index()
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "holidays": [
+            {"date": d.isoformat(), "name": name, "inLieu": in_lieu}
+            for d, name, in_lieu in index.holidays_between(start, end)
+        ],
+        "workdays": [{"date": d.isoformat(), "name": name} for d, name in index.workdays_between(start, end)],
+        "pairs": [{"holiday": h.isoformat(), "workday": w.isoformat()} for h, w in index.pairs_between(start, end)],
+    }
+
+
 @router.put('/web/autorun/compensation')
 async def put_compensation(
     identity: Annotated[str, Depends(get_current_identity)],
@@ -109,9 +129,7 @@ async def put_compensation(
     try:
         etype, scope, level, content = parse_payload_basic(payload, int(AutorunType.COMPENSATION))
         date_str = str(content.get('date'))
-        use_date_str = str(content.get('useDate'))
-        datetime.date.fromisoformat(date_str)
-        datetime.date.fromisoformat(use_date_str)
+        use_date_str = datetime.date.fromisoformat(str(content.get('useDate'))).isoformat()
         parameters = {"rule": {"date": date_str, "useDate": use_date_str}}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'无效参数: {e}')
@@ -5,6 +5,7 @@ from routers.web.configs.subjects import router as subjects_router
 from routers.web.configs.timetable import router as timetable_router
 from routers.web.configs.setting import router as setting_router
 from routers.web.configs.menu import router as menu_router
+from routers.web.configs.weather import router as weather_router
 
 router = APIRouter()
 
@@ -13,3 +14,4 @@ router.include_router(subjects_router)
 router.include_router(timetable_router)
 router.include_router(setting_router)
 router.include_router(menu_router)
+router.include_router(weather_router)
@@ -1,10 +1,39 @@
-from fastapi import APIRouter
-from utils.path import discovery_path
+from typing import Any, Callable
+
+from fastapi import APIRouter, Request, Response, status
+from fastapi.responses import ORJSONResponse
+
+from utils.index import Tree, index
 
 router = APIRouter()
 
+# (接口名, 索引版本) -> 响应内容，目录树未变化时直接复用
+_rendered: dict[str, tuple[int, Any]] = {}
+
+
+async def _respond(request: Request, name: str, render: Callable[[Tree], Any]) -> Response:
+    tree = await index.get()
+    headers = {"ETag": index.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == index.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    cached = _rendered.get(name)
+    if cached is None or cached[0] != index.version:
+        cached = (index.version, render(tree))
+        _rendered[name] = cached
+    return ORJSONResponse(cached[1], headers=headers)
+
+
 @router.get("/web/menu")
-async def get_menu():
+async def get_menu(request: Request):
+    return await _respond(request, "menu", _render_menu)
+
+
+@router.get('/web/structure')
+async def get_structure(request: Request):
+    return await _respond(request, "structure", _render_structure)
+
+
+def _render_menu(tree: Tree) -> dict:
     menu = {
         'data': [
             {
@@ -64,19 +93,18 @@ async def get_menu():
                                         "children": None
                                     }
                                 ]
-                            } for c in await discovery_path(f"./data/{s}/{g}/")
+                            } for c in classes
                         ]
-                    } for g in await discovery_path(f"./data/{s}/")
+                    } for g, classes in grades.items()
                 ]
             }
-            for s in await discovery_path('./data/')
+            for s, grades in tree.items()
         ]
     )
     return menu
 
 
-@router.get('/web/structure')
-async def get_structure():
+def _render_structure(tree: Tree) -> list:
     return [
         {  # 学校
             "text": s,
@@ -87,10 +115,10 @@ async def get_structure():
                         {  # 班级
                             "text": c,
                             "children": None
-                        } for c in await discovery_path(f"./data/{s}/{g}/")
+                        } for c in classes
                     ]
-                } for g in await discovery_path(f"./data/{s}/")
+                } for g, classes in grades.items()
             ]
         }
-        for s in await discovery_path('./data/')
+        for s, grades in tree.items()
     ]
\ No newline at end of file
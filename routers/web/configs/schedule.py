@@ -1,23 +1,21 @@
 from fastapi import APIRouter, Depends, Body
 from fastapi.responses import ORJSONResponse
-import pathlib
-import orjson
 import json
 from loguru import logger
 from typing import Annotated
-from utils.globalvar import websocket_clients
+from utils import bus
+from utils.index import index
 from utils.schedule import run_fix
 from utils.schedule.dataclasses import Schedule
+from utils.store import store
 from utils.verify import get_current_identity
 
 router = APIRouter()
 
 @router.get("/web/config/{school}/{grade}/{cls}/schedule", response_class=ORJSONResponse)
 def get_schedule(school: str, grade: str, cls: str):
-    schedule: dict = orjson.loads(pathlib.Path(f"./data/{school}/{grade}/{cls}/schedule.json").read_text())
-    timetable: dict[str, dict] = orjson.loads(
-        pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text()
-    )["timetable"]
+    schedule: dict = store.read("schedule", school, grade, cls)
+    timetable: dict[str, dict] = store.read("timetable", school, grade)["timetable"]
     max_subjects = max([max([v for v in timetable[x].values() if isinstance(v, int)]) for x in timetable.keys()]) + 1
     for index_d, day in enumerate(schedule["daily_class"]):
         # 校验 daily_class.timetable 是否在 timetable 中，不存在则指定为“常日”
@@ -55,19 +53,15 @@ async def update_schedule(
             await run_fix(
                 {
                     **schedule,
-                    **json.loads(
-                        pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text()
-                    )
+                    **store.read("timetable", school, grade)
                 }
             )
         )['daily_class']
     }
     logger.debug(schedule)
     text = json.dumps(schedule, indent=4, ensure_ascii=False)
-    pathlib.Path(f"./data/{school}/{grade}/{cls}/schedule.json").write_text(text)
+    await store.put("schedule", schedule, school, grade, cls)
+    await index.add(school, grade, cls)
     logger.info(f"更新课表：\n{text}")
-    try:
-        await websocket_clients[(school, grade)].broadcast("SyncConfig")
-    except KeyError:
-        logger.warning(f"没有找到对应的websocket连接：{school} {grade}")
+    await bus.broadcast(school, grade, "SyncConfig")
     return ORJSONResponse({'status': 200})
@@ -1,19 +1,19 @@
 from fastapi import APIRouter, Depends
 from fastapi.responses import ORJSONResponse
-import pathlib
-import orjson
 import json
 from loguru import logger
 from typing import Annotated
-from utils.globalvar import websocket_clients
+from utils import bus
+from utils.index import index
 from utils.schedule.dataclasses import Setting
+from utils.store import store
 from utils.verify import get_current_identity
 
 router = APIRouter()
 
 @router.get("/web/config/{school}/{grade}/{cls}/settings", response_class=ORJSONResponse)
 def get_setting(school: str, grade: str, cls: str):
-    data = orjson.loads(pathlib.Path(f"./data/{school}/{grade}/{cls}/config.json").read_text())
+    data = store.read("config", school, grade, cls)
     return ORJSONResponse(data)
 
 @router.put("/web/config/{school}/{grade}/{cls}/settings", response_class=ORJSONResponse)
@@ -23,12 +23,11 @@ async def update_setting(
     setting: Setting,
 ):
     logger.info(f"收到更新设置请求：{identity}")
-    text = json.dumps(setting.model_dump(), indent=4, ensure_ascii=False)
-    pathlib.Path(f"./data/{school}/{grade}/{cls}/config.json").write_text(text, encoding="utf-8")
+    data = setting.model_dump()
+    text = json.dumps(data, indent=4, ensure_ascii=False)
+    await store.put("config", data, school, grade, cls)
+    await index.add(school, grade, cls)
     logger.info(f"更新设置：\n{text}")
-    try:
-        await websocket_clients[(school, grade)].broadcast("SyncConfig")
-    except KeyError:
-        logger.warning(f"没有找到对应的websocket连接：{school} {grade}")
+    await bus.broadcast(school, grade, "SyncConfig")
     return ORJSONResponse({'status': 200})
 
@@ -1,19 +1,19 @@
 from fastapi import APIRouter, Depends, Body
 from fastapi.responses import ORJSONResponse
-import pathlib
-import orjson
 import json
 from loguru import logger
 from typing import Annotated
-from utils.globalvar import websocket_clients
+from utils import bus
+from utils.index import index
 from utils.schedule.dataclasses import Subjects
+from utils.store import store
 from utils.verify import get_current_identity
 
 router = APIRouter()
 
 @router.get("/web/config/{school}/{grade}/subjects/options", response_class=ORJSONResponse)
 def get_subjects_options(school: str, grade: str):
-    subjects: dict = orjson.loads(pathlib.Path(f"./data/{school}/{grade}/subjects.json").read_text())["subject_name"]
+    subjects: dict = store.read("subjects", school, grade)["subject_name"]
     return ORJSONResponse(
         {
             "options": [
@@ -24,7 +24,7 @@ def get_subjects_options(school: str, grade: str):
 
 @router.get("/web/config/{school}/{grade}/subjects", response_class=ORJSONResponse)
 def get_subjects(school: str, grade: str):
-    subjects: dict = orjson.loads(pathlib.Path(f"./data/{school}/{grade}/subjects.json").read_text())["subject_name"]
+    subjects: dict = store.read("subjects", school, grade)["subject_name"]
     return ORJSONResponse(
         {
             "abbr": [{"text": x} for x in subjects.keys()],
@@ -46,11 +46,9 @@ async def update_subjects(
     subject_name = dict(zip(abbrs, fulls))
     data = {"subject_name": subject_name}
     text = json.dumps(data, indent=4, ensure_ascii=False)
-    pathlib.Path(f"./data/{school}/{grade}/subjects.json").write_text(text, encoding="utf-8")
+    await store.put("subjects", data, school, grade)
+    await index.add(school, grade)
     logger.info(f"更新科目：\n{text}")
-    try:
-        await websocket_clients[(school, grade)].broadcast("SyncConfig")
-    except KeyError:
-        logger.warning(f"没有找到对应的websocket连接：{school} {grade}")
+    await bus.broadcast(school, grade, "SyncConfig")
     return ORJSONResponse({'status': 200})
 
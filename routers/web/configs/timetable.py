@@ -1,23 +1,21 @@
 import json
-import pathlib
 from typing import Annotated
 
-import orjson
 from fastapi import APIRouter, Depends
 from fastapi.responses import ORJSONResponse
 from loguru import logger
 
-from utils.globalvar import websocket_clients
+from utils import bus
+from utils.index import index
 from utils.schedule.dataclasses import Timetable
+from utils.store import store
 from utils.verify import get_current_identity
 
 router = APIRouter()
 
 @router.get("/web/config/{school}/{grade}/timetable/options", response_class=ORJSONResponse)
 def get_timetable_options(school: str, grade: str):
-    timetable: dict[str, dict] = orjson.loads(
-        pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text()
-    )["timetable"]
+    timetable: dict[str, dict] = store.read("timetable", school, grade)["timetable"]
     return ORJSONResponse(
         {
             "options": [
@@ -29,7 +27,7 @@ def get_timetable_options(school: str, grade: str):
 
 @router.get("/web/config/{school}/{grade}/timetable", response_class=ORJSONResponse)
 def get_timetable(school: str, grade: str):
-    data = orjson.loads(pathlib.Path(f"./data/{school}/{grade}/timetable.json").read_text())
+    data = store.read("timetable", school, grade)
     return ORJSONResponse(data)
 
 @router.put("/web/config/{school}/{grade}/timetable", response_class=ORJSONResponse)
@@ -39,11 +37,10 @@ async def update_timetable(
     timetable: Timetable,
 ):
     logger.info(f"收到更新作息时间请求：{identity}")
-    text = json.dumps(timetable.model_dump(), indent=4, ensure_ascii=False)
-    pathlib.Path(f"./data/{school}/{grade}/timetable.json").write_text(text, encoding="utf-8")
+    data = timetable.model_dump()
+    text = json.dumps(data, indent=4, ensure_ascii=False)
+    await store.put("timetable", data, school, grade)
+    await index.add(school, grade)
     logger.info(f"更新作息时间：\n{text}")
-    try:
-        await websocket_clients[(school, grade)].broadcast("SyncConfig")
-    except KeyError:
-        logger.warning(f"没有找到对应的websocket连接：{school} {grade}")
+    await bus.broadcast(school, grade, "SyncConfig")
     return ORJSONResponse({'status': 200})
@@ -0,0 +1,35 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from loguru import logger
+
+from utils import weather
+from utils.index import index
+from utils.schedule.dataclasses import WeatherCity
+from utils.store import store
+from utils.verify import get_current_identity
+
+router = APIRouter()
+
+@router.get("/web/config/{school}/{grade}/{cls}/weather", response_class=ORJSONResponse)
+def get_weather_city(school: str, grade: str, cls: str):
+    city = weather.read_class_city(school, grade, cls)
+    if city is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="该班级未配置所在城市")
+    return ORJSONResponse({"name": city[0], "province": city[1]})
+
+@router.put("/web/config/{school}/{grade}/{cls}/weather", response_class=ORJSONResponse)
+async def update_weather_city(
+    school: str, grade: int, cls: int,
+    identity: Annotated[str, Depends(get_current_identity)],
+    city: WeatherCity,
+):
+    logger.info(f"收到更新所在城市请求：{identity}")
+    data = city.model_dump()
+    text = json.dumps(data, indent=4, ensure_ascii=False)
+    await store.put("weather", data, school, grade, cls)
+    await index.add(school, grade, cls)
+    logger.info(f"更新所在城市：\n{text}")
+    return ORJSONResponse({'status': 200})
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from utils import metrics
+from utils.config import config
+from utils.globalvar import websocket_clients
+
+router = APIRouter()
+
+
+def _websocket_connections() -> dict[tuple[str, ...], float]:
+    counts: dict[tuple[str, ...], float] = {}
+    for (school, _), manager in list(websocket_clients.items()):
+        counts[(school,)] = counts.get((school,), 0) + len(manager.active_connections)
+    return counts
+
+
+def _outbox_depth() -> dict[tuple[str, ...], float]:
+    depths: dict[tuple[str, ...], float] = {}
+    for (school, _), manager in list(websocket_clients.items()):
+        depths[(school,)] = depths.get((school,), 0) + sum(len(o.queue) for o in list(manager.outboxes.values()))
+    return depths
+
+
+def _thread_pool() -> dict[tuple[str, ...], float]:
+    return {
+        (pool, state): value
+        for pool, states in metrics.thread_pools().items()
+        for state, value in states.items()
+    }
+
+
+metrics.Gauge(
+    "websocket_connections", "各学校当前的 WebSocket 连接数", ("school",), collect=_websocket_connections
+)
+metrics.Gauge("ws_outbox_depth", "各学校 WebSocket 发送队列中待发送的消息数", ("school",), collect=_outbox_depth)
+metrics.Gauge("thread_pool", "线程池占用情况", ("pool", "state"), collect=_thread_pool)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """
+    Prometheus 文本格式的指标，仅允许配置中的地址访问
+    :return: text/plain; version=0.0.4
+    """
+    if not config.metrics.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='指标未开启')
+    if request.client is None or request.client.host not in config.metrics.allow:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='不允许访问')
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,66 @@
+import typing
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from loguru import logger
+
+from utils import profiler
+from utils.verify import get_current_identity
+
+router = APIRouter()
+
+MAX_SECONDS = 120
+
+BUSY = HTTPException(status_code=status.HTTP_409_CONFLICT, detail='已有性能分析正在进行')
+
+
+@router.post("/web/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    identity: Annotated[str, Depends(get_current_identity)],
+    seconds: float = Query(10.0, gt=0, le=MAX_SECONDS),
+    mode: typing.Literal["sample", "cprofile"] = "sample",
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+    sort: typing.Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = Query(60, ge=1, le=1000)
+):
+    """
+    对运行中的进程进行 CPU 分析，分析期间请求照常处理
+    :param identity: 身份验证
+    :param seconds: 分析时长（秒）
+    :param mode: sample：采样所有线程，返回折叠栈（可生成火焰图）；cprofile：分析事件循环线程，返回 pstats 报告
+    :param interval: 采样间隔（秒），仅 sample
+    :param sort: 排序字段，仅 cprofile
+    :param limit: 输出的函数数量，仅 cprofile
+    :return: 纯文本分析结果
+    """
+    logger.info(f"开始 {seconds} 秒的 CPU 分析（{mode}），{identity}")
+    try:
+        if mode == "sample":
+            collapsed, samples = await profiler.sample(seconds, interval)
+            return PlainTextResponse(collapsed, headers={"X-Profile-Samples": str(samples)})
+        return PlainTextResponse(await profiler.profile(seconds, sort, limit))
+    except profiler.Busy:
+        raise BUSY
+
+
+@router.post("/web/profile/memory", response_class=ORJSONResponse)
+async def profile_memory(
+    identity: Annotated[str, Depends(get_current_identity)],
+    seconds: float = Query(10.0, gt=0, le=MAX_SECONDS),
+    limit: int = Query(30, ge=1, le=500),
+    frames: int = Query(10, ge=1, le=64)
+):
+    """
+    对比分析期间前后的 tracemalloc 快照，返回内存增长最多的分配位置
+    :param identity: 身份验证
+    :param seconds: 两次快照的间隔（秒）
+    :param limit: 返回的条目数量
+    :param frames: 记录的调用栈深度
+    :return: Json，按增长量排序的分配位置
+    """
+    logger.info(f"开始 {seconds} 秒的内存分析，{identity}")
+    try:
+        return ORJSONResponse(await profiler.memory(seconds, limit, frames))
+    except profiler.Busy:
+        raise BUSY
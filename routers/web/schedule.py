@@ -1,13 +1,13 @@
 import datetime
-import json
-import pathlib
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
+import orjson
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
-from utils.calc import weeks, from_str_to_date
-from utils.db import fetch_records
+from utils import term
+from utils.db import fetch_records_between
 from utils.schedule.dataclasses import AutorunType
 from utils.schedule.helpers import (
     decode_rule,
@@ -15,6 +15,7 @@ from utils.schedule.helpers import (
     row_etype,
     row_level,
 )
+from utils.store import store
 
 router = APIRouter()
 
@@ -38,10 +39,10 @@ def _parse_scope(scope: str) -> Tuple[str, Optional[int], Optional[int]]:
     return school, grade, class_number
 
 
-def _build_candidate(row: Dict[str, Any], *, date_obj: datetime.date, school: str, grade: int,
-                     class_number: Optional[int]) -> Optional[Tuple[int, int, int, Dict[str, Any]]]:
+def _build_candidate(row: Dict[str, Any], *, school: str, grade: int,
+                     class_number: Optional[int]) -> Optional[Tuple[datetime.date, int, int, int, Dict[str, Any]]]:
     """
-    将一条记录转换为 (etype, level, specificity, rule) 候选，若不适用则返回 None。
+    将一条记录转换为 (date, etype, level, specificity, rule) 候选，若不适用则返回 None。
     """
     etype = row_etype(row)
     if etype not in (int(AutorunType.COMPENSATION), int(AutorunType.TIMETABLE)):
@@ -51,40 +52,45 @@ def _build_candidate(row: Dict[str, Any], *, date_obj: datetime.date, school: st
         d = datetime.date.fromisoformat(str(rule.get('date')))
     except Exception:
         return None
-    if d != date_obj:
-        return None
     spec = row_applicable_specificity(row, school, grade, class_number)
     if spec < 0:
         return None
     level = row_level(row)
-    return etype, level, spec, rule
+    return d, etype, level, spec, rule
 
 
-def _collect_rules_for_date(date_obj: datetime.date, school: str, grade: int, class_number: Optional[int]) -> Dict[
-    int, List[Tuple[int, int, Dict[str, Any]]]]:
-    """按 etype -> [(level, specificity, rule)] 收集在指定 date 生效的规则"""
-    rows = fetch_records()
-    bucket: Dict[int, List[Tuple[int, int, Dict[str, Any]]]] = {0: [], 1: []}
+def _collect_rules_for_range(start: datetime.date, end: datetime.date, school: str, grade: int,
+                             class_number: Optional[int]) -> Dict[datetime.date, Dict[int, List[Tuple[int, int, Dict[str, Any]]]]]:
+    """按 date -> etype -> [(level, specificity, rule)] 收集在 [start, end] 内生效的规则（一次索引查询）"""
+    rows = fetch_records_between(start, end)
+    buckets: Dict[datetime.date, Dict[int, List[Tuple[int, int, Dict[str, Any]]]]] = {}
     for r in rows:
-        cand = _build_candidate(r, date_obj=date_obj, school=school, grade=grade, class_number=class_number)
+        cand = _build_candidate(r, school=school, grade=grade, class_number=class_number)
         if cand is None:
             continue
-        etype, level, spec, rule = cand
-        bucket.setdefault(etype, []).append((level, spec, rule))
+        d, etype, level, spec, rule = cand
+        if not start <= d <= end:
+            continue
+        buckets.setdefault(d, {0: [], 1: []}).setdefault(etype, []).append((level, spec, rule))
     # 排序
-    for k in bucket.keys():
-        bucket[k].sort(key=lambda x: (x[0], x[1]))
-    return bucket
+    for bucket in buckets.values():
+        for k in bucket.keys():
+            bucket[k].sort(key=lambda x: (x[0], x[1]))
+    return buckets
+
+
+def _collect_rules_for_date(date_obj: datetime.date, school: str, grade: int, class_number: Optional[int]) -> Dict[
+    int, List[Tuple[int, int, Dict[str, Any]]]]:
+    """按 etype -> [(level, specificity, rule)] 收集在指定 date 生效的规则"""
+    return _collect_rules_for_range(date_obj, date_obj, school, grade, class_number).get(date_obj, {0: [], 1: []})
 
 
 def _load_schedule_files(school: str, grade: int, class_number: int) -> Dict[str, Any]:
-    base = pathlib.Path(f"./data/{school}/{grade}")
-    cls = base / str(class_number)
     return {
-        **json.loads((base / 'subjects.json').read_text(encoding='utf-8')),
-        **json.loads((base / 'timetable.json').read_text(encoding='utf-8')),
-        **json.loads((cls / 'config.json').read_text(encoding='utf-8')),
-        **json.loads((cls / 'schedule.json').read_text(encoding='utf-8')),
+        **store.read('subjects', school, grade),
+        **store.read('timetable', school, grade),
+        **store.read('config', school, grade, class_number),
+        **store.read('schedule', school, grade, class_number),
     }
 
 
@@ -96,11 +102,10 @@ def _pick_week_item(item: Any, week_idx: int) -> Any:
 
 def _compute_week_index(schedule: Dict[str, Any], date_obj: datetime.date) -> int:
     try:
-        start = from_str_to_date(schedule.get('start'))
+        w = term.week_of(schedule.get('start'), date_obj)
     except Exception:
         # 默认用当前周数 1
         return 0
-    w = weeks(start, date_obj)
     return (w - 1) if w > 0 else 0
 
 
@@ -115,12 +120,18 @@ def _period_indices_for_timetable(schedule: Dict[str, Any], timetable_id: str) -
 
 def _build_periods(schedule: Dict[str, Any], date_obj: datetime.date, school: str, grade: int, class_number: int) -> \
 List[Dict[str, Any]]:
+    # collect applicable autorun rules for this date/scope
+    rules = _collect_rules_for_date(date_obj, school, grade, class_number)
+    return _periods_with_rules(schedule, date_obj, rules)
+
+
+def _periods_with_rules(schedule: Dict[str, Any], date_obj: datetime.date,
+                        rules: Dict[int, List[Tuple[int, int, Dict[str, Any]]]]) -> List[Dict[str, Any]]:
     # 1) week/day
     week_idx = _compute_week_index(schedule, date_obj)
     dow_idx = date_obj.isoweekday() % 7
 
-    # 2) collect applicable autorun rules for this date/scope
-    rules = _collect_rules_for_date(date_obj, school, grade, class_number)
+    # 2) rules: etype -> [(level, specificity, rule)] already collected for this date/scope
 
     # 3) resolve source day for classes (compensation)
     src_dow_idx = dow_idx
@@ -162,6 +173,18 @@ List[Dict[str, Any]]:
     return periods
 
 
+def _load_class(scope: str, path: str) -> Tuple[str, int, int, Dict[str, Any]]:
+    try:
+        school, grade, class_number = _parse_scope(scope)
+        if class_number is None:
+            raise ValueError('scope 需要包含班级，如 39/2023/1')
+        schedule = _load_schedule_files(school, grade, class_number)
+    except Exception as e:
+        logger.warning(f"{path} 解析失败: {e}")
+        raise HTTPException(status_code=400, detail=f'无效的 scope 或配置缺失: {e}')
+    return school, grade, class_number, schedule
+
+
 @router.get('/web/schedule/by-date')
 def get_schedule_by_date(date: str = Query(..., description='YYYY-MM-DD'), scope: str = Query(...)):
     """
@@ -172,14 +195,38 @@ def get_schedule_by_date(date: str = Query(..., description='YYYY-MM-DD'), scope
         date_obj = datetime.date.fromisoformat(date)
     except Exception:
         raise HTTPException(status_code=400, detail='无效的日期格式，应为 YYYY-MM-DD')
-    try:
-        school, grade, class_number = _parse_scope(scope)
-        if class_number is None:
-            raise ValueError('scope 需要包含班级，如 39/2023/1')
-        schedule = _load_schedule_files(school, grade, class_number)
-    except Exception as e:
-        logger.warning(f"/web/schedule/by-date 解析失败: {e}")
-        raise HTTPException(status_code=400, detail=f'无效的 scope 或配置缺失: {e}')
+    school, grade, class_number, schedule = _load_class(scope, '/web/schedule/by-date')
 
     periods = _build_periods(schedule, date_obj, school, grade, class_number)
     return {"data": {"periods": periods}}
+
+
+def _stream_range(schedule: Dict[str, Any], start: datetime.date, end: datetime.date,
+                  rules: Dict[datetime.date, Dict[int, List[Tuple[int, int, Dict[str, Any]]]]]) -> Iterator[bytes]:
+    yield b'{"data":['
+    date_obj = start
+    while date_obj <= end:
+        if date_obj != start:
+            yield b','
+        yield orjson.dumps({
+            "date": date_obj.isoformat(),
+            "periods": _periods_with_rules(schedule, date_obj, rules.get(date_obj, {0: [], 1: []})),
+        })
+        date_obj += datetime.timedelta(days=1)
+    yield b']}'
+
+
+@router.get('/web/schedule/by-date/range')
+def get_schedule_by_date_range(start: datetime.date, end: datetime.date, scope: str = Query(...)):
+    """
+    返回 [start, end] 内每天的课节列表，供管理端日历视图一次性渲染。
+    班级配置只读取一次，区间内的规则通过一次索引查询取出，结果逐日流式输出。
+    返回格式：{"data": Array<{date:string, periods: Array<{no:number, subject:string}>}>}
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail='end 不能早于 start')
+    if (end - start).days > 366:
+        raise HTTPException(status_code=400, detail='查询范围不能超过一年')
+    school, grade, class_number, schedule = _load_class(scope, '/web/schedule/by-date/range')
+    rules = _collect_rules_for_range(start, end, school, grade, class_number)
+    return StreamingResponse(_stream_range(schedule, start, end, rules), media_type='application/json')
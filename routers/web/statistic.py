@@ -1,7 +1,14 @@
-from fastapi import APIRouter
+import datetime
+import typing
+
+from fastapi import APIRouter, HTTPException, Query, status
 from fastapi.responses import ORJSONResponse
 
+from utils import bus, ci, clients, monitor, timeseries, weather
+from utils.config import config
 from utils.globalvar import websocket_clients
+from utils.refresh import planner
+from utils.store import store
 
 router = APIRouter()
 
@@ -11,11 +18,53 @@ statistic = {
 }
 
 def reset_statistic():
-    global statistic
-    statistic = {
-        "weather_error": 0,  # 天气 API 响应错误次数（不含重试次数）
-        "websocket_disconnect": {}  # WebSocket 连接异常断开次数
-    }
+    # 原地清空，已导入 statistic 的模块仍持有同一个对象
+    statistic["weather_error"] = 0
+    statistic["websocket_disconnect"].clear()
+
+def _label(school, grade, class_number) -> str:
+    return f"{school} 学校 {grade} 级 {class_number} 班"
+
+def load_statistic():
+    """
+    从持久化统计中恢复今日的计数（程序重启后不丢失当天的统计）
+    """
+    statistic["weather_error"] = int(timeseries.today("weather_error").get("", 0))
+    statistic["websocket_disconnect"].clear()
+    for scope, value in timeseries.today("websocket_disconnect").items():
+        school, grade, class_number = scope.split("/")
+        statistic["websocket_disconnect"][_label(school, grade, class_number)] = int(value)
+
+def _on_statistic(payload: dict):
+    match payload.get("kind"):
+        case "weather_error":
+            statistic["weather_error"] += 1
+        case "websocket_disconnect":
+            label = payload["label"]
+            statistic["websocket_disconnect"][label] = statistic["websocket_disconnect"].get(label, 0) + 1
+
+bus.subscribe("statistic", _on_statistic)
+
+async def record_weather_error():
+    """
+    记录一次天气 API 响应错误（会同步到所有 worker）
+    """
+    # 持久化统计只在发生的 worker 中记录一次，不随事件总线重复
+    timeseries.record("weather_error")
+    await bus.publish("statistic", {"kind": "weather_error"})
+
+async def record_disconnect(school: str, grade: int | str, class_number: int | str) -> int:
+    """
+    记录一次 WebSocket 连接异常断开（会同步到所有 worker）
+    :param school: 学校标识
+    :param grade: 年级
+    :param class_number: 班级
+    :return: 该班级今日已异常断开的次数
+    """
+    label = _label(school, grade, class_number)
+    timeseries.record("websocket_disconnect", f"{school}/{grade}/{class_number}")
+    await bus.publish("statistic", {"kind": "websocket_disconnect", "label": label})
+    return statistic["websocket_disconnect"][label]
 
 @router.get("/web/statistic", response_class=ORJSONResponse)
 def get_statistic():
@@ -24,7 +73,14 @@ def get_statistic():
     :return: Json，表示统计信息
     """
     websocket_clients_list = {"clients": []}
+    outbound = {"policy": config.websocket.overflow, "queued": 0, "max_depth": 0, "dropped": 0, "collapsed": 0, "queues": []}
     for (school, grade), manager in websocket_clients.items():
+        for item in manager.queue_stats():
+            outbound["queued"] += item["depth"]
+            outbound["max_depth"] = max(outbound["max_depth"], item["depth"])
+            outbound["dropped"] += item["dropped"]
+            outbound["collapsed"] += item["collapsed"]
+            outbound["queues"].append({"school": school, "grade": grade, **item})
         for client in manager.active_connections:
             if manager.get_class_object(client).debug:
                 continue
@@ -37,7 +93,77 @@ def get_statistic():
             **websocket_clients_list,
             **{
                 "websocket_disconnect_count": sum(statistic["websocket_disconnect"].values()),
-                "clients_count": len(websocket_clients_list["clients"])
+                "clients_count": len(websocket_clients_list["clients"]),
+                "refresh": planner.stats(),
+                "outbound": outbound,
+                "weather_cache": weather.report_cache.stats(),
+                "city_cache_size": len(weather.cache),
+                "weather_breaker": weather.breaker.stats(),
+                "http": clients.stats(),
+                "ci_cache": ci.build_cache.stats(),
+                "storage": store.stats(),
+                "timeseries": timeseries.stats(),
+                "event_loop": monitor.stats()
             }
         }
-    )
\ No newline at end of file
+    )
+
+@router.get("/web/statistic/trend", response_class=ORJSONResponse)
+def get_statistic_trend(
+    metric: str,
+    start: datetime.date,
+    end: datetime.date,
+    granularity: typing.Literal["hour", "day"] = "day",
+    label: str | None = None
+):
+    """
+    获取持久化统计的趋势
+    :param metric: 指标名称：weather_error、websocket_disconnect（标签为 学校/年级/班级）、requests（标签为路由）
+    :param start: 起始日期（含）
+    :param end: 结束日期（含）
+    :param granularity: hour 或 day
+    :param label: 仅查询该标签
+    :return: Json，标签 -> 按时间升序的 {"time", "value"}
+    """
+    if end < start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='end 不能早于 start')
+    limit = config.stats.hourly_retention if granularity == "hour" else config.stats.daily_retention
+    if (end - start).days >= limit:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'查询范围不能超过 {limit} 天')
+    return ORJSONResponse(
+        {
+            "metric": metric,
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "series": timeseries.trend(metric, granularity, start, end, label)
+        }
+    )
+
+@router.get("/web/statistic/top", response_class=ORJSONResponse)
+def get_statistic_top(
+    metric: str = "websocket_disconnect",
+    days: int = Query(28, ge=1),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """
+    最近若干天内计数最多的标签，如长期频繁异常断开的班级
+    :param metric: 指标名称
+    :param days: 统计最近多少天（含今天）
+    :param limit: 返回的最大条数
+    :return: Json，按出现天数、总数降序
+    """
+    if days > config.stats.daily_retention:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f'查询范围不能超过 {config.stats.daily_retention} 天'
+        )
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    return ORJSONResponse(
+        {
+            "metric": metric,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "data": timeseries.top(metric, start, end, limit)
+        }
+    )
@@ -7,4 +7,16 @@ from . import weather
 from . import ws
 from . import globalvar
 from . import db
-from . import autorun
\ No newline at end of file
+from . import autorun
+from . import bus
+from . import clients
+from . import mirror
+from . import term
+from . import index
+from . import store
+from . import versions
+from . import metrics
+from . import timeseries
+from . import trace
+from . import profiler
+from . import monitor
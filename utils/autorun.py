@@ -1,10 +1,12 @@
 import datetime
 import json
-import pathlib
 from typing import Any, Optional, Dict, Tuple, Set
 
+from utils import bus
 from utils.globalvar import websocket_clients
+from utils.schedule import finish
 from utils.schedule.dataclasses import AutorunType
+from utils.store import DocumentNotFound, store
 
 
 def _fmt_dt(value: Any) -> str:
@@ -67,10 +69,11 @@ def validate_content(content):
     if not isinstance(date_str, str):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='content.date 必须为字符串')
     try:
-        datetime.date.fromisoformat(date_str)
+        date = datetime.date.fromisoformat(date_str)
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='content.date 格式错误')
-    return content
+    # fromisoformat 也接受 20250901 等写法，统一保存为 YYYY-MM-DD，按日期查询时才能直接比较字符串
+    return {**content, 'date': date.isoformat()}
 
 
 def validate_periods(periods, need_count, subject_set):
@@ -107,10 +110,6 @@ def parse_payload_basic(payload: Dict[str, Any], expected_type: int) -> Tuple[in
     return etype, scope, level, content
 
 
-def _read_json(path: pathlib.Path) -> dict:
-    return json.loads(path.read_text(encoding='utf-8'))
-
-
 def get_subject_set(scope):
     subject_set: Set[str] = set()
     pairs: Set[Tuple[str, str]] = set()
@@ -121,11 +120,8 @@ def get_subject_set(scope):
         if len(parts) >= 2:
             pairs.add((parts[0], parts[1]))
     for school, grade in sorted(pairs):
-        path = pathlib.Path(f"./data/{school}/{grade}/subjects.json")
-        if not path.exists():
-            continue
         try:
-            data = json.loads(path.read_text())
+            data = store.read("subjects", school, grade)
             for subj in data.get("subjects", []):
                 v = subj.get("value")
                 if v:
@@ -136,25 +132,14 @@ def get_subject_set(scope):
 
 
 def _yield_first_class_in_grade(school: str, grade: str):
-    base = pathlib.Path(f"./data/{school}/{grade}")
-    if base.exists():
-        for p in sorted(base.iterdir()):
-            if p.is_dir():
-                yield school, grade, p.name
-                break
+    for cls in store.classes(school, grade)[:1]:
+        yield school, grade, cls
 
 
 def _yield_any_grade_and_class_in_school(school: str):
-    base = pathlib.Path(f"./data/{school}")
-    if base.exists():
-        for g in sorted(base.iterdir()):
-            if g.is_dir():
-                gb = pathlib.Path(g)
-                for c in sorted(gb.iterdir()):
-                    if c.is_dir():
-                        yield school, g.name, c.name
-                        break
-                break
+    for grade in store.grades(school)[:1]:
+        for cls in store.classes(school, grade)[:1]:
+            yield school, grade, cls
 
 
 def _iter_scope_paths(scope):
@@ -179,10 +164,10 @@ def _to_count_from_timetable_entry(entry: dict) -> int:
 
 def _get_label_count(school: str, grade: str, label: str) -> int:
     from fastapi import HTTPException, status
-    tpath = pathlib.Path(f"./data/{school}/{grade}/timetable.json")
-    if not tpath.exists():
+    try:
+        data = store.read('timetable', school, grade)
+    except DocumentNotFound:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'未找到作息表：{school}/{grade}')
-    data = _read_json(tpath)
     tmap = data.get('timetable') or {}
     if label not in tmap:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'作息表不存在：{label}')
@@ -191,10 +176,10 @@ def _get_label_count(school: str, grade: str, label: str) -> int:
 
 def _infer_label_for_date(school: str, grade: str, cls: str, date_str: str) -> str:
     from fastapi import HTTPException, status
-    spath = pathlib.Path(f"./data/{school}/{grade}/{cls}/schedule.json")
-    if not spath.exists():
+    try:
+        data = store.read('schedule', school, grade, cls)
+    except DocumentNotFound:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'未找到班级课表：{school}/{grade}/{cls}')
-    data = _read_json(spath)
     dlist = data.get('daily_class')
     if not isinstance(dlist, list) or len(dlist) != 7:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='课表 daily_class 配置不正确')
@@ -274,7 +259,8 @@ def _targets_for_grade(school: str, grade_str: str) -> Set[Tuple[str, int]]:
     return targets
 
 
-async def notify_ws_by_scope(scope: list[str]):
+async def _notify_local_by_scope(payload: Dict[str, Any]):
+    scope = payload.get('scope')
     targets: Set[Tuple[str, int]] = set()
     if not isinstance(scope, list):
         return
@@ -297,10 +283,23 @@ async def notify_ws_by_scope(scope: list[str]):
         if mgr:
             try:
                 await mgr.broadcast("SyncConfig")
+                await finish.refresh_grade(*key)
             except Exception:
                 continue
 
 
+bus.subscribe('scope', _notify_local_by_scope)
+
+
+async def notify_ws_by_scope(scope: list[str]):
+    """
+    按作用域向相关年级广播 SyncConfig（包括其他 worker 上的连接）
+    """
+    if not isinstance(scope, list):
+        return
+    await bus.publish('scope', {'scope': scope})
+
+
 def map_row(row: dict) -> dict:
     status_map = {0: '待生效', 1: '生效中', 2: '已过期'}
     try:
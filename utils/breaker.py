@@ -0,0 +1,78 @@
+import time
+
+from loguru import logger
+
+
+class CircuitOpen(Exception):
+    """
+    熔断器处于打开状态，暂不访问上游
+    """
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，冷却期内直接拒绝请求；冷却结束后放行一次试探请求（半开），
+    试探成功则关闭，失败则重新打开
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0  # 连续失败次数
+        self.opened_at = 0.0
+        self.opened_count = 0  # 累计打开次数
+        self.rejected = 0  # 因熔断而被拒绝的请求数
+        self._probing = False
+
+    def allow(self) -> bool:
+        """
+        是否允许访问上游
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """
+        放弃已获得的试探机会（请求未到达上游即结束，如被取消），让之后的请求可以再次试探
+        """
+        self._probing = False
+
+    def success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"熔断器 {self.name} 试探成功，已关闭")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+                logger.warning(f"熔断器 {self.name} 已打开：连续失败 {self.failures} 次，{self.reset_timeout} 秒后试探")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened_count": self.opened_count,
+            "rejected": self.rejected,
+            "retry_in": round(max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0), 1)
+            if self.state == self.OPEN else 0.0,
+        }
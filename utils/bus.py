@@ -0,0 +1,183 @@
+import asyncio
+import inspect
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+import orjson
+from loguru import logger
+
+from utils.config import config
+from utils.globalvar import websocket_clients
+from utils.schedule import finish
+
+# 当前进程的唯一标识，用于在轮询时跳过自己发布的事件（本进程的事件已在发布时直接分发）
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+Handler = Callable[[dict[str, Any]], Awaitable[None] | None]
+
+_handlers: dict[str, list[Handler]] = {}
+_last_id: int = 0
+_task: asyncio.Task | None = None
+
+
+def subscribe(channel: str, handler: Handler):
+    """
+    订阅某个频道的事件
+    :param channel: 频道名称
+    :param handler: 事件处理函数，可以是同步函数或协程函数，参数为事件内容
+    """
+    _handlers.setdefault(channel, []).append(handler)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(config.cluster.bus, timeout=5)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+def _init_table() -> int:
+    os.makedirs(os.path.dirname(config.cluster.bus) or '.', exist_ok=True)
+    conn = _connect()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            created REAL NOT NULL
+        )
+    ''')
+    conn.commit()
+    # 只接收启动之后发布的事件
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+    conn.close()
+    return int(last_id)
+
+
+def _insert(channel: str, payload: str):
+    conn = _connect()
+    conn.execute(
+        'INSERT INTO events (channel, payload, origin, created) VALUES (?, ?, ?, ?)',
+        (channel, payload, ORIGIN, time.time())
+    )
+    conn.commit()
+    conn.close()
+
+
+def _fetch_after(last_id: int) -> list[tuple[int, str, str, str]]:
+    conn = _connect()
+    rows = conn.execute(
+        'SELECT id, channel, payload, origin FROM events WHERE id > ? ORDER BY id', (last_id,)
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _prune(before: float) -> int:
+    conn = _connect()
+    cur = conn.execute('DELETE FROM events WHERE created < ?', (before,))
+    affected = cur.rowcount
+    conn.commit()
+    conn.close()
+    return affected
+
+
+async def _dispatch(channel: str, payload: dict[str, Any]):
+    for handler in _handlers.get(channel, []):
+        try:
+            result = handler(payload)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as err:
+            logger.exception(f"处理总线事件失败：{channel} {payload} {err}", exc_info=True)
+
+
+async def publish(channel: str, payload: dict[str, Any]):
+    """
+    发布事件：先在本进程内分发，若开启了集群模式则同时写入通知表，由其他 worker 轮询接收
+    :param channel: 频道名称
+    :param payload: 事件内容（需可被 JSON 序列化）
+    """
+    await _dispatch(channel, payload)
+    if config.cluster.enabled:
+        try:
+            await asyncio.to_thread(_insert, channel, orjson.dumps(payload).decode())
+        except sqlite3.Error as err:
+            logger.error(f"写入事件总线失败，其他 worker 将收不到该事件：{channel} {err}")
+
+
+async def _poll_loop():
+    global _last_id
+    last_prune = time.time()
+    while True:
+        await asyncio.sleep(config.cluster.poll_interval)
+        try:
+            rows = await asyncio.to_thread(_fetch_after, _last_id)
+        except sqlite3.Error as err:
+            logger.error(f"轮询事件总线失败：{err}")
+            continue
+        for event_id, channel, payload, origin in rows:
+            _last_id = event_id
+            if origin == ORIGIN:
+                continue
+            await _dispatch(channel, orjson.loads(payload))
+        if time.time() - last_prune > config.cluster.retention:
+            last_prune = time.time()
+            try:
+                await asyncio.to_thread(_prune, last_prune - config.cluster.retention)
+            except sqlite3.Error as err:
+                logger.warning(f"清理事件总线失败：{err}")
+
+
+async def start():
+    """
+    启动事件总线轮询（仅在集群模式下）
+    """
+    global _last_id, _task
+    if not config.cluster.enabled:
+        return
+    _last_id = await asyncio.to_thread(_init_table)
+    _task = asyncio.create_task(_poll_loop())
+    logger.info(f"事件总线已启动：{config.cluster.bus}，worker 标识 {ORIGIN}")
+
+
+async def stop():
+    """
+    停止事件总线轮询
+    """
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+async def _on_broadcast(payload: dict[str, Any]):
+    key = (payload['school'], int(payload['grade']))
+    mgr = websocket_clients.get(key)
+    if mgr is None:
+        logger.debug(f"本 worker 没有找到对应的 websocket 连接：{key[0]} {key[1]}")
+        return
+    await mgr.broadcast(payload['message'])
+    if payload['message'] == "SyncConfig":
+        await finish.refresh_grade(*key)
+
+
+async def broadcast(school: str, grade: int | str, message: str = "SyncConfig"):
+    """
+    向某学校某年级的所有 WebSocket 连接广播消息（包括其他 worker 上的连接）
+    :param school: 学校编号 / 名称
+    :param grade: 年级
+    :param message: 消息内容
+    """
+    await publish('broadcast', {'school': school, 'grade': int(grade), 'message': message})
+
+
+subscribe('broadcast', _on_broadcast)
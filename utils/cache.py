@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from loguru import logger
+
+
+class AsyncTTLCache:
+    """
+    带过期时间的异步缓存：
+    - 同一个 key 的并发未命中只会触发一次上游请求（singleflight）
+    - 过期后的 stale 时间内先返回旧值，同时在后台刷新（stale-while-revalidate）
+    - 超过 maxsize 时按最近最少使用淘汰
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()  # key -> (value, 写入时间)
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+
+    async def get(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        获取缓存值，未命中时调用 fetcher 获取
+        :param key: 缓存键
+        :param fetcher: 无参数的协程函数，返回需要缓存的值
+        :return: 缓存值
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored = entry
+            age = time.monotonic() - stored
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                self._revalidate(key, fetcher)
+                return value
+        self.misses += 1
+        return await asyncio.shield(self._load(key, fetcher))
+
+    async def refresh(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        不论缓存是否过期，立即重新获取（与同一 key 的其他请求合并）
+        """
+        return await asyncio.shield(self._load(key, fetcher))
+
+    def peek(self, key: Hashable) -> tuple[Any, float] | None:
+        """
+        无论是否过期，返回最近一次成功获取的值及其年龄（秒），不存在时返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.monotonic() - entry[1]
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0):
+        self._entries[key] = (value, time.monotonic() - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None):
+        """
+        使某个 key（或全部）失效
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _load(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetcher))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    def _revalidate(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]):
+        if key in self._inflight:
+            return
+        self._load(key, fetcher).add_done_callback(self._log_background_error)
+
+    @staticmethod
+    def _log_background_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"后台刷新缓存失败，继续使用旧值：{task.exception()!r}")
+
+    async def _fetch(self, key: Hashable, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        self.fetches += 1
+        try:
+            value = await fetcher()
+        except Exception:
+            self.errors += 1
+            raise
+        self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "errors": self.errors,
+        }
@@ -1,4 +1,6 @@
 import datetime
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
 from functools import lru_cache
 from typing import Optional, List, Tuple, Dict
 
@@ -14,13 +16,15 @@ def from_str_to_date(date_str: str, format_str: str = '%Y-%m-%d') -> datetime.da
     """
     return datetime.datetime.strptime(date_str, format_str).date()
 
-def weeks(start_date: datetime.date, end_date: datetime.date = datetime.date.today()) -> int:
+def weeks(start_date: datetime.date, end_date: Optional[datetime.date] = None) -> int:
     """
     计算从 start_date 到当前日期的周数
     :param start_date: 起始日期
-    :param end_date: 结束日期，默认为今天
+    :param end_date: 结束日期，默认为今天（调用时取值）
     :return: 周数（按自然周计算，也就是即使开始日期是周日，结束日期是下周一，也会计算为第 2 周）
     """
+    if end_date is None:
+        end_date = datetime.date.today()
     return (
         (
             (end_date + datetime.timedelta(days=7 - end_date.isoweekday())) -
@@ -29,14 +33,89 @@ def weeks(start_date: datetime.date, end_date: datetime.date = datetime.date.tod
     ) // 7
 
 
+@dataclass(frozen=True)
+class CompensationIndex:
+    """
+    chinese_calendar 支持的所有年份的节假日与调休数据，各列表均按日期升序排列，可用 bisect 做区间查询
+    """
+    holidays: List[datetime.date]  # 所有法定节假日（含调休休息日）
+    holiday_details: List[str]  # 与 holidays 一一对应的节日名称
+    workdays: List[datetime.date]  # 所有补班日
+    workday_details: List[str]  # 与 workdays 一一对应的节日名称
+    pairs: List[Tuple[datetime.date, datetime.date]]  # (调休休息日, 补班日)，按调休休息日升序
+    holiday_to_workday: Dict[datetime.date, datetime.date]
+    workday_to_holiday: Dict[datetime.date, datetime.date]
+
+    def _window(self, dates: List[datetime.date], start: datetime.date, end: datetime.date) -> range:
+        return range(bisect_left(dates, start), bisect_right(dates, end))
+
+    def holidays_between(self, start: datetime.date, end: datetime.date) -> List[Tuple[datetime.date, str, bool]]:
+        """
+        [start, end] 内的节假日：(日期, 节日名称, 是否为调休休息日)
+        """
+        return [
+            (self.holidays[i], self.holiday_details[i], self.holidays[i] in self.holiday_to_workday)
+            for i in self._window(self.holidays, start, end)
+        ]
+
+    def workdays_between(self, start: datetime.date, end: datetime.date) -> List[Tuple[datetime.date, str]]:
+        """
+        [start, end] 内的补班日：(日期, 节日名称)
+        """
+        return [(self.workdays[i], self.workday_details[i]) for i in self._window(self.workdays, start, end)]
+
+    def pairs_between(self, start: datetime.date, end: datetime.date) -> List[Tuple[datetime.date, datetime.date]]:
+        """
+        调休休息日或补班日落在 [start, end] 内的配对
+        """
+        return [(h, w) for h, w in self.pairs if start <= h <= end or start <= w <= end]
+
+
+_HOLIDAY_NAMES = {h.value: h.chinese for h in chinese_calendar.Holiday}
+
+
+@lru_cache(maxsize=1)
+def compensation_index() -> CompensationIndex:
+    """
+    一次性构建所有年份的调休映射。
+    规则：按年份与 chinese_calendar 中的 detail 归组；组内分别对“调休休息日”和“补班日”排序后按序配对；zip 最短长度保证稳健。
+    """
+    # (year, detail) -> list[workday]
+    group_workdays: Dict[Tuple[int, object], List[datetime.date]] = {}
+    for d, detail in chinese_calendar.workdays.items():
+        group_workdays.setdefault((d.year, detail), []).append(d)
+
+    # (year, detail) -> list[in-lieu holiday]
+    group_holidays: Dict[Tuple[int, object], List[datetime.date]] = {}
+    for d, detail in chinese_calendar.holidays.items():
+        if chinese_calendar.is_in_lieu(d):
+            group_holidays.setdefault((d.year, detail), []).append(d)
+
+    mapping: Dict[datetime.date, datetime.date] = {}
+    for key, holidays in group_holidays.items():
+        workdays = group_workdays.get(key, [])
+        for h, w in zip(sorted(holidays), sorted(workdays)):
+            mapping[h] = w
+
+    holidays = sorted(chinese_calendar.holidays.items())
+    workdays = sorted(chinese_calendar.workdays.items())
+    return CompensationIndex(
+        holidays=[d for d, _ in holidays],
+        holiday_details=[_HOLIDAY_NAMES.get(detail, detail) for _, detail in holidays],
+        workdays=[d for d, _ in workdays],
+        workday_details=[_HOLIDAY_NAMES.get(detail, detail) for _, detail in workdays],
+        pairs=sorted(mapping.items()),
+        holiday_to_workday=mapping,
+        workday_to_holiday={w: h for h, w in mapping.items()},
+    )
+
+
 def compensation_from_holiday(date: datetime.date) -> Optional[datetime.date]:
     """
     输入：某个节假日日期 date
     行为：若该日是调休休息日（in-lieu holiday），返回对应的补班日；否则返回 None。
     """
-    if not chinese_calendar.is_in_lieu(date):
-        return None
-    return _holiday_to_workday_map(date.year).get(date)
+    return compensation_index().holiday_to_workday.get(date)
 
 
 def compensation_from_workday(workday: datetime.date) -> Optional[datetime.date]:
@@ -44,10 +123,7 @@ def compensation_from_workday(workday: datetime.date) -> Optional[datetime.date]
     输入：某个被调休成为补班日的日期 workday
     行为：若该日是补班日（法定工作日中的“被调休工作日”），返回其对应的调休节假日；否则返回 None。
     """
-    # chinese_calendar.workdays 中仅包含被调整为工作日的周末/节假日
-    if workday not in chinese_calendar.workdays:
-        return None
-    return _workday_to_holiday_map(workday.year).get(workday)
+    return compensation_index().workday_to_holiday.get(workday)
 
 
 def compensation_pairs(year: int) -> List[Tuple[datetime.date, datetime.date]]:
@@ -55,44 +131,7 @@ def compensation_pairs(year: int) -> List[Tuple[datetime.date, datetime.date]]:
     输入：年份 year
     输出：该年所有 (调休休息日 -> 补班日) 的配对列表，按日期升序。
     """
-    mapping = _holiday_to_workday_map(year)
-    return sorted(mapping.items(), key=lambda p: (p[0], p[1]))
-
-
-@lru_cache(maxsize=16)
-def _holiday_to_workday_map(year: int) -> Dict[datetime.date, datetime.date]:
-    """
-    构建指定年份的映射：调休休息日(holiday 且 in_lieu) -> 对应补班日(workday)。
-    规则：按 chinese_calendar 中的 detail 归组；组内分别对“调休休息日”和“补班日”排序后按序配对；zip 最短长度保证稳健。
-    """
-    # detail -> list[workday]
-    detail_to_workdays: Dict[object, List[datetime.date]] = {}
-    for d, detail in chinese_calendar.workdays.items():
-        if d.year == year:
-            detail_to_workdays.setdefault(detail, []).append(d)
-
-    # detail -> list[in-lieu holiday]
-    detail_to_holidays: Dict[object, List[datetime.date]] = {}
-    for d, detail in chinese_calendar.holidays.items():
-        if d.year == year and chinese_calendar.is_in_lieu(d):
-            detail_to_holidays.setdefault(detail, []).append(d)
-
-    mapping: Dict[datetime.date, datetime.date] = {}
-    for detail, holidays in detail_to_holidays.items():
-        workdays = detail_to_workdays.get(detail, [])
-        if not workdays:
-            continue
-        for h, w in zip(sorted(holidays), sorted(workdays)):
-            mapping[h] = w
-    return mapping
-
-
-@lru_cache(maxsize=16)
-def _workday_to_holiday_map(year: int) -> Dict[datetime.date, datetime.date]:
-    """
-    逆映射：补班日(workday) -> 调休休息日(holiday)
-    """
-    fwd = _holiday_to_workday_map(year)
-    return {w: h for h, w in fwd.items()}
-
-
+    pairs = compensation_index().pairs
+    lo = bisect_left(pairs, (datetime.date(year, 1, 1),))
+    hi = bisect_left(pairs, (datetime.date(year + 1, 1, 1),))
+    return pairs[lo:hi]
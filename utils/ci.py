@@ -1,16 +1,102 @@
+import asyncio
 import datetime
+import json
+import pathlib
 
-import httpx
 from loguru import logger
 
+from utils import clients
+from utils.cache import AsyncTTLCache
+from utils.config import config
 
-async def get_from_jenkins(url: str, filename: str) -> dict[str, str]:
+STATE_PATH = pathlib.Path("./data/ci/latest.json")
+
+# (url, filename) -> 最近一次成功构建的信息；CI 不可达时始终返回旧值
+build_cache = AsyncTTLCache(ttl=config.ci.ttl, stale_ttl=float("inf"), maxsize=8)
+# url -> 条件请求所需的校验信息（ETag / Last-Modified）
+_validators: dict[str, dict[str, str]] = {}
+
+
+def _save_state(url: str, filename: str, build: dict):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    STATE_PATH.write_text(
+        json.dumps({"url": url, "filename": filename, "build": build, "validators": _validators.get(url, {})},
+                   indent=4, ensure_ascii=False),
+        encoding="utf-8"
+    )
+
+
+def load_state():
+    """
+    读取上次保存的构建信息，使启动后的第一个请求无需等待 CI（读取到的信息视为已过期，会在后台重新验证）
+    """
+    if not STATE_PATH.exists():
+        return
+    try:
+        state = json.loads(STATE_PATH.read_text(encoding="utf-8"))
+        build_cache.set((state["url"], state["filename"]), state["build"], age=config.ci.ttl)
+        _validators[state["url"]] = state.get("validators") or {}
+        logger.info(f"已读取上次保存的构建信息：{state['build']['build_date']}")
+    except Exception as err:
+        logger.warning(f"读取上次保存的构建信息失败：{err}")
+
+
+async def _fetch_jenkins(url: str, filename: str) -> dict:
     logger.debug(f"GET {url}/lastSuccessfulBuild/api/json")
-    async with httpx.AsyncClient() as client:
-        resp = (await client.get(f"{url}/lastSuccessfulBuild/api/json")).json()
-    build_date = datetime.date.fromtimestamp(resp["timestamp"] // 1000).strftime("%Y%m%d")
-    logger.info(f"Last successful build date: {build_date}")
-    return {
-        "build_date": build_date,
-        "url": f"{url}/lastSuccessfulBuild/artifact/{filename}"
+    cached = build_cache.peek((url, filename))
+    headers = {}
+    if cached is not None:
+        validators = _validators.get(url, {})
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+    response = await clients.client().get(f"{url}/lastSuccessfulBuild/api/json", headers=headers)
+    if response.status_code == 304 and cached is not None:
+        logger.debug("构建信息未变化")
+        return cached[0]
+    response.raise_for_status()
+    resp = response.json()
+    number = resp.get("number")
+    build = {
+        "build_date": datetime.date.fromtimestamp(resp["timestamp"] // 1000).strftime("%Y%m%d"),
+        # 固定到具体构建号：lastSuccessfulBuild 随时可能指向更新的构建，下载到的文件会与构建信息不一致
+        "url": f"{url}/{number}/artifact/{filename}" if number is not None
+        else f"{url}/lastSuccessfulBuild/artifact/{filename}",
+        "number": number,
+        "timestamp": resp["timestamp"],
+    }
+    _validators[url] = {
+        key: response.headers[header]
+        for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+        if header in response.headers
     }
+    logger.info(f"Last successful build: #{build['number']} ({build['build_date']})")
+    await asyncio.to_thread(_save_state, url, filename, build)
+    return build
+
+
+async def get_from_jenkins(url: str, filename: str) -> dict[str, str]:
+    """
+    获取 Jenkins 最近一次成功构建的信息（带缓存：过期或 CI 不可达时返回旧值并在后台刷新）
+    :param url: Jenkins 任务地址
+    :param filename: 构建产物文件名
+    :return: {"build_date": 构建日期, "url": 构建产物地址, "number": 构建号}
+    """
+    build = await build_cache.get((url, filename), lambda: _fetch_jenkins(url, filename))
+    return {"build_date": build["build_date"], "url": build["url"], "number": build.get("number")}
+
+
+async def refresh():
+    """
+    定时任务：在后台重新验证构建信息
+    """
+    match config.ci.kind:
+        case "jenkins":
+            try:
+                await build_cache.refresh(
+                    (config.ci.url, config.ci.filename),
+                    lambda: _fetch_jenkins(config.ci.url, config.ci.filename)
+                )
+            except Exception as err:
+                logger.warning(f"刷新构建信息失败，继续使用旧值：{err!r}")
@@ -0,0 +1,138 @@
+import aiohttp
+import httpx
+from loguru import logger
+
+from utils.config import config
+
+_session: aiohttp.ClientSession | None = None
+_client: httpx.AsyncClient | None = None
+
+statistic = {
+    "aiohttp": {
+        "requests": 0,  # 发出的请求数
+        "errors": 0,  # 请求异常数
+        "connections_created": 0,  # 新建连接数（含 TCP/TLS 握手）
+        "connections_reused": 0,  # 复用连接数
+        "dns_cache_hits": 0,
+        "dns_cache_misses": 0,
+    },
+    "httpx": {
+        "requests": 0,
+        "errors": 0,
+    },
+}
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    counters = statistic["aiohttp"]
+
+    def counter(name: str):
+        async def handler(*_):
+            counters[name] += 1
+        return handler
+
+    trace.on_request_start.append(counter("requests"))
+    trace.on_request_exception.append(counter("errors"))
+    trace.on_connection_create_end.append(counter("connections_created"))
+    trace.on_connection_reuseconn.append(counter("connections_reused"))
+    trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+    trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+    return trace
+
+
+def _create_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=config.http.limit,
+            limit_per_host=config.http.limit_per_host,
+            ttl_dns_cache=config.http.dns_ttl,
+            keepalive_timeout=config.http.keepalive,
+        ),
+        timeout=aiohttp.ClientTimeout(total=config.http.timeout, connect=config.http.connect_timeout),
+        trace_configs=[_trace_config()],
+    )
+
+
+def _create_client() -> httpx.AsyncClient:
+    counters = statistic["httpx"]
+
+    async def on_request(_):
+        counters["requests"] += 1
+
+    async def on_response(response: httpx.Response):
+        if response.is_error:
+            counters["errors"] += 1
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.http.limit,
+            max_keepalive_connections=config.http.limit_per_host,
+            keepalive_expiry=config.http.keepalive,
+        ),
+        timeout=httpx.Timeout(config.http.timeout, connect=config.http.connect_timeout),
+        event_hooks={"request": [on_request], "response": [on_response]},
+    )
+
+
+def session() -> aiohttp.ClientSession:
+    """
+    获取全局共享的 aiohttp 会话（连接池），未初始化时自动创建
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+def client() -> httpx.AsyncClient:
+    """
+    获取全局共享的 httpx 客户端（连接池），未初始化时自动创建
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def init():
+    """
+    在应用启动时创建连接池
+    """
+    session()
+    client()
+    logger.info(
+        f"HTTP 连接池已创建：limit={config.http.limit}, limit_per_host={config.http.limit_per_host}, "
+        f"timeout={config.http.timeout}s"
+    )
+
+
+async def close():
+    """
+    在应用关闭时释放连接池
+    """
+    global _session, _client
+    if _session is not None:
+        await _session.close()
+        _session = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def stats() -> dict:
+    """
+    连接池统计信息
+    """
+    return {
+        "aiohttp": {
+            **statistic["aiohttp"],
+            "open": _session is not None and not _session.closed,
+            "limit": config.http.limit,
+            "limit_per_host": config.http.limit_per_host,
+        },
+        "httpx": {
+            **statistic["httpx"],
+            "open": _client is not None and not _client.is_closed,
+        },
+    }
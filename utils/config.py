@@ -1,6 +1,6 @@
 import pathlib
 import typing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import toml
 from loguru import logger
@@ -20,6 +20,7 @@ class Server:
     host: str
     port: int
     domain: list[str]
+    workers: int = 1
 
 @dataclass
 class Log:
@@ -33,6 +34,87 @@ class CI:
     kind: typing.Literal["jenkins"]
     url: str
     filename: str
+    ttl: float = 300.0  # 构建信息缓存时长（秒），过期后先返回旧值再后台刷新
+    refresh_interval: int = 300  # 后台刷新构建信息的间隔（秒）
+    mirror: bool = True  # 是否将构建产物镜像到本地，客户端从本服务下载
+    mirror_keep: int = 5  # 本地保留的构建数量，至少保留最新的构建
+    delta_depth: int = 3  # 为新构建生成相对于之前几个构建的增量包
+
+@dataclass
+class Cluster:
+    enabled: bool = False  # 多 worker 部署时开启，通过本地 SQLite 通知表在进程间转发事件
+    bus: str = "./data/bus.db"
+    poll_interval: float = 0.2  # 秒
+    retention: int = 60  # 事件保留时长（秒）
+
+@dataclass
+class Refresh:
+    concurrency: int = 4  # 同时生成课表的最大数量
+    max_window: float = 30.0  # SyncConfig 后客户端刷新的最大分散窗口（秒）
+    queue_timeout: float = 10.0  # 课表请求排队的最长时间（秒），超时返回 503
+
+@dataclass
+class Websocket:
+    queue_size: int = 32  # 每个连接发送队列的最大长度
+    overflow: typing.Literal["drop_oldest", "collapse", "disconnect"] = "collapse"  # 队列溢出时的处理策略
+
+@dataclass
+class Weather:
+    ttl: float = 600.0  # 天气结果缓存时长（秒）
+    stale: float = 1800.0  # 过期后仍可先返回旧值并后台刷新的时长（秒）
+    retries: int = 3  # 单次获取的最大尝试次数
+    backoff: float = 0.2  # 首次重试前的等待时间（秒），之后按指数增长
+    deadline: float = 8.0  # 单次获取（含重试）的总时限（秒）
+    failure_threshold: int = 5  # 连续失败多少次后打开熔断器
+    reset_timeout: float = 30.0  # 熔断器打开后多久放行试探请求（秒）
+    prefetch_interval: int = 300  # 为已连接班级预取天气的间隔（秒），0 表示关闭
+    push: bool = False  # 预取后是否通过 WebSocket 推送给协议 2 的客户端
+    city_cache_size: int = 2048  # 城市 ID 缓存的最大条数
+    negative_ttl: int = 86400  # 不存在的城市的缓存时长（秒）
+    batch_concurrency: int = 4  # 批量查询时同时访问上游的最大城市数
+    batch_limit: int = 50  # 单次批量查询的最大城市数
+
+@dataclass
+class Http:
+    timeout: float = 10.0  # 单次请求总超时（秒）
+    connect_timeout: float = 5.0  # 建立连接超时（秒）
+    limit: int = 100  # 连接池最大连接数
+    limit_per_host: int = 20  # 每个目标主机的最大连接数
+    dns_ttl: int = 300  # DNS 缓存时长（秒）
+    keepalive: float = 30.0  # 空闲连接保持时长（秒）
+
+@dataclass
+class Storage:
+    backend: typing.Literal["json", "sqlite"] = "json"  # 配置文档的存储方式
+    root: str = "./data/"  # json：目录树根目录
+    database: str = "./data/config.db"  # sqlite：数据库文件
+    flush_delay: float = 0.2  # 保存后延迟落盘的时间（秒），期间对同一文档的多次保存只写一次
+
+@dataclass
+class Metrics:
+    enabled: bool = True  # 是否提供 /metrics（Prometheus 文本格式）
+    allow: list[str] = field(default_factory=lambda: ["127.0.0.1", "::1"])  # 允许抓取的客户端地址
+
+@dataclass
+class Stats:
+    database: str = "./data/stats.db"  # 持久化统计数据库
+    flush_interval: int = 10  # 批量写入间隔（秒）
+    hourly_retention: int = 14  # 小时统计保留天数
+    daily_retention: int = 730  # 日统计保留天数
+
+@dataclass
+class Trace:
+    server_timing: bool = True  # 是否在响应头中附带 Server-Timing
+    sample_rate: float = 0.0  # 将分段计时写入 JSONL 的请求比例，0 表示关闭
+    file: str = "./logs/trace.jsonl"
+
+@dataclass
+class Monitor:
+    enabled: bool = True  # 是否监控事件循环延迟与线程池占用
+    interval: float = 0.1  # 心跳间隔（秒），短于该值的阻塞可能无法被发现
+    lag_warning: float = 0.1  # 调度延迟超过该值（秒）时记录阻塞并输出警告
+    pool_warning: float = 0.9  # 同步路由线程池占用比例超过该值时输出警告
+    warn_interval: float = 60.0  # 同类警告的最小间隔（秒），事件循环阻塞警告不受限制
 
 @dataclass
 class Config:
@@ -41,6 +123,16 @@ class Config:
     server: Server
     log: Log
     ci: CI
+    cluster: Cluster
+    refresh: Refresh
+    websocket: Websocket
+    weather: Weather
+    http: Http
+    storage: Storage
+    metrics: Metrics
+    stats: Stats
+    trace: Trace
+    monitor: Monitor
 
 DEFAULT_CONFIG = \
 """[apikey]
@@ -53,6 +145,7 @@ token = "YOUR_SECRET_TOKEN"
 host = "0.0.0.0"
 port = 8114
 domain=["https://manager.example.com"]
+workers = 1
 
 [log]
 level = "INFO"
@@ -64,6 +157,77 @@ retention = "14 days"
 kind = "jenkins"
 url = "https://ci.example.com/job/ElectronClassSchedule"
 filename = "release.zip"
+ttl = 300.0
+refresh_interval = 300
+mirror = true
+mirror_keep = 5
+delta_depth = 3
+
+[cluster]
+enabled = false
+bus = "./data/bus.db"
+poll_interval = 0.2
+retention = 60
+
+[refresh]
+concurrency = 4
+max_window = 30.0
+queue_timeout = 10.0
+
+[websocket]
+queue_size = 32
+overflow = "collapse"
+
+[weather]
+ttl = 600.0
+stale = 1800.0
+retries = 3
+backoff = 0.2
+deadline = 8.0
+failure_threshold = 5
+reset_timeout = 30.0
+prefetch_interval = 300
+push = false
+city_cache_size = 2048
+negative_ttl = 86400
+batch_concurrency = 4
+batch_limit = 50
+
+[http]
+timeout = 10.0
+connect_timeout = 5.0
+limit = 100
+limit_per_host = 20
+dns_ttl = 300
+keepalive = 30.0
+
+[storage]
+backend = "json"
+root = "./data/"
+database = "./data/config.db"
+flush_delay = 0.2
+
+[metrics]
+enabled = true
+allow = ["127.0.0.1", "::1"]
+
+[stats]
+database = "./data/stats.db"
+flush_interval = 10
+hourly_retention = 14
+daily_retention = 730
+
+[trace]
+server_timing = true
+sample_rate = 0.0
+file = "./logs/trace.jsonl"
+
+[monitor]
+enabled = true
+interval = 0.1
+lag_warning = 0.1
+pool_warning = 0.9
+warn_interval = 60.0
 """
 
 CONFIG_PATH = "config.toml"
@@ -79,7 +243,17 @@ try:
         secret=Secret(**CONFIG_JSON["secret"]),
         server=Server(**CONFIG_JSON["server"]),
         log=Log(**CONFIG_JSON["log"]),
-        ci=CI(**CONFIG_JSON["ci"])
+        ci=CI(**CONFIG_JSON["ci"]),
+        cluster=Cluster(**CONFIG_JSON.get("cluster", {})),
+        refresh=Refresh(**CONFIG_JSON.get("refresh", {})),
+        websocket=Websocket(**CONFIG_JSON.get("websocket", {})),
+        weather=Weather(**CONFIG_JSON.get("weather", {})),
+        http=Http(**CONFIG_JSON.get("http", {})),
+        storage=Storage(**CONFIG_JSON.get("storage", {})),
+        metrics=Metrics(**CONFIG_JSON.get("metrics", {})),
+        stats=Stats(**CONFIG_JSON.get("stats", {})),
+        trace=Trace(**CONFIG_JSON.get("trace", {})),
+        monitor=Monitor(**CONFIG_JSON.get("monitor", {}))
     )
 except TypeError as e:
     logger.exception(
@@ -5,8 +5,16 @@ import os
 import sqlite3
 from typing import Optional, List, Dict, Any, Tuple
 
+from utils.metrics import sqlite_duration, timed
+
 DB_PATH: Optional[str] = None
 
+# 规则生效日期（兼容 {"rule": {...}} 与平铺两种格式），按日期查询时需使用完全相同的表达式才能命中索引
+RULE_DATE = (
+    "(CASE WHEN json_valid(parameters) "
+    "THEN COALESCE(json_extract(parameters, '$.rule.date'), json_extract(parameters, '$.date')) END)"
+)
+
 
 def init_db(db_path: str):
     global DB_PATH
@@ -23,11 +31,66 @@ def init_db(db_path: str):
             status INTEGER NOT NULL
         )
     ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS city_cache (
+            name TEXT NOT NULL,
+            adm TEXT NOT NULL,
+            city_id TEXT,
+            updated REAL NOT NULL,
+            PRIMARY KEY (name, adm)
+        )
+    ''')
+    # 最近一次命中缓存的时间，预热与清理按此排序（旧表没有该列时补上）
+    if 'used' not in _get_columns(conn, 'city_cache'):
+        cursor.execute('ALTER TABLE city_cache ADD COLUMN used REAL')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS records_rule_date ON records ({RULE_DATE})')
+    # records 的写入次数，读取方据此判断规则是否变化，无需读出全部记录比较（多个 worker 共享）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS records_version (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO records_version (id, version) VALUES (0, 0)')
+    _normalize_rule_dates(cursor)
     conn.commit()
     conn.close()
     DB_PATH = db_path
 
 
+def _normalize_rule_dates(cur: sqlite3.Cursor):
+    """
+    将旧记录中 20250901 等非标准写法的日期改写为 YYYY-MM-DD，否则按日期范围查询时无法命中
+    """
+    cur.execute('SELECT hashid, parameters FROM records')
+    updated = 0
+    for hid, params_text in cur.fetchall():
+        try:
+            params = json.loads(params_text)
+        except Exception:
+            continue
+        if not isinstance(params, dict):
+            continue
+        rule = params.get('rule') if isinstance(params.get('rule'), dict) else params
+        changed = False
+        for key in ('date', 'useDate'):
+            value = rule.get(key)
+            try:
+                normalized = datetime.date.fromisoformat(value).isoformat()
+            except (TypeError, ValueError):
+                continue
+            if normalized != value:
+                rule[key] = normalized
+                changed = True
+        if changed:
+            cur.execute(
+                'UPDATE records SET parameters = ? WHERE hashid = ?', (json.dumps(params, ensure_ascii=False), hid)
+            )
+            updated += 1
+    if updated:
+        _bump_version(cur)
+
+
 def get_connection() -> sqlite3.Connection:
     if not DB_PATH:
         # 默认路径与 main.py 初始化一致
@@ -44,6 +107,7 @@ def _get_columns(conn: sqlite3.Connection, table: str) -> set[str]:
     return cols
 
 
+@timed(sqlite_duration, "fetch_records")
 def fetch_records(hashid: str = None) -> List[Dict[str, Any]]:
     conn = get_connection()
     conn.row_factory = sqlite3.Row
@@ -72,12 +136,48 @@ def fetch_records(hashid: str = None) -> List[Dict[str, Any]]:
     return rows
 
 
+@timed(sqlite_duration, "fetch_records_between")
+def fetch_records_between(start: datetime.date, end: datetime.date) -> List[Dict[str, Any]]:
+    """
+    查询生效日期在 [start, end] 内的记录（走 records_rule_date 索引，无需扫描全表）
+    """
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    scope_col = 'scope' if 'scope' in _get_columns(conn, 'records') else "'ALL' AS scope"
+    cur.execute(
+        f"SELECT hashid, etype, {scope_col}, parameters, level, status FROM records WHERE {RULE_DATE} BETWEEN ? AND ?",
+        (start.isoformat(), end.isoformat())
+    )
+    rows = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+def _bump_version(cur: sqlite3.Cursor):
+    cur.execute('UPDATE records_version SET version = version + 1 WHERE id = 0')
+
+
+@timed(sqlite_duration, "records_version")
+def records_version() -> int:
+    """records 表的版本号，每次写入后变大"""
+    conn = get_connection()
+    try:
+        row = conn.execute('SELECT version FROM records_version WHERE id = 0').fetchone()
+    finally:
+        conn.close()
+    return 0 if row is None else row[0]
+
+
+@timed(sqlite_duration, "delete_record")
 def delete_record(hashid: str) -> int:
     """按 hashid 删除记录，返回受影响行数"""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute('DELETE FROM records WHERE hashid = ?', (hashid,))
     affected = cur.rowcount
+    if affected:
+        _bump_version(cur)
     conn.commit()
     conn.close()
     return affected
@@ -90,6 +190,7 @@ def _calc_hashid(etype: int, scope: List[str], level: int, parameters: Dict[str,
     return hashlib.sha256(seed.encode('utf-8')).hexdigest()[:16]
 
 
+@timed(sqlite_duration, "upsert_record")
 def upsert_record(etype: int, scope: List[str], level: int, parameters: Dict[str, Any],
                   hashid: Optional[str] = None) -> Tuple[str, int]:
     """
@@ -112,6 +213,7 @@ def upsert_record(etype: int, scope: List[str], level: int, parameters: Dict[str
         )
     )
     affected = cur.rowcount
+    _bump_version(cur)
     conn.commit()
     conn.close()
     return hid, affected
@@ -150,6 +252,7 @@ def _derive_status_for_record(etype: int, parameters: Dict[str, Any], today: Opt
     return 0
 
 
+@timed(sqlite_duration, "refresh_statuses")
 def refresh_statuses(today: Optional[datetime.date] = None) -> int:
     """遍历 records 并刷新 status 字段，返回更新条数"""
     if today is None:
@@ -168,6 +271,59 @@ def refresh_statuses(today: Optional[datetime.date] = None) -> int:
         if int(status) != new_status:
             cur.execute('UPDATE records SET status = ? WHERE hashid = ?', (new_status, hid))
             updated += 1
+    if updated:
+        _bump_version(cur)
     conn.commit()
     conn.close()
     return updated
+
+
+@timed(sqlite_duration, "load_city_cache")
+def load_city_cache(limit: int) -> List[Tuple[str, Optional[str], Optional[str], float]]:
+    """
+    读取最近使用（命中或获取）的城市 ID 缓存
+    :return: [(name, adm, city_id, updated)]，adm 为空时返回 None，city_id 为 None 表示城市不存在
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        'SELECT name, adm, city_id, updated FROM city_cache ORDER BY COALESCE(used, updated) DESC LIMIT ?', (limit,)
+    )
+    rows = [(name, adm or None, city_id, updated) for name, adm, city_id, updated in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+@timed(sqlite_duration, "save_city_cache")
+def save_city_cache(name: str, adm: Optional[str], city_id: Optional[str], updated: float, limit: int):
+    """
+    写入一条城市 ID 缓存，并只保留最近使用的 limit 条
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        'INSERT OR REPLACE INTO city_cache (name, adm, city_id, updated, used) VALUES (?, ?, ?, ?, ?)',
+        (name, adm or '', city_id, updated, updated)
+    )
+    cur.execute(
+        'DELETE FROM city_cache WHERE rowid NOT IN '
+        '(SELECT rowid FROM city_cache ORDER BY COALESCE(used, updated) DESC LIMIT ?)',
+        (limit,)
+    )
+    conn.commit()
+    conn.close()
+
+
+@timed(sqlite_duration, "touch_city_cache")
+def touch_city_cache(entries: List[Tuple[str, Optional[str], float]]):
+    """
+    批量记录城市 ID 缓存的命中时间
+    :param entries: [(name, adm, used)]
+    """
+    conn = get_connection()
+    conn.executemany(
+        'UPDATE city_cache SET used = ? WHERE name = ? AND adm = ?',
+        [(used, name, adm or '') for name, adm, used in entries]
+    )
+    conn.commit()
+    conn.close()
@@ -0,0 +1,87 @@
+import json
+import os
+import pathlib
+import tempfile
+import zipfile
+
+from loguru import logger
+
+MANIFEST = "delta.json"
+
+
+def delta_name(base: int) -> str:
+    """
+    增量包文件名，以旧版本的构建号区分（同一天可能有多次构建，构建日期不能唯一确定版本）
+    """
+    return f"delta-{base}.zip"
+
+
+def _members(archive: zipfile.ZipFile) -> dict[str, tuple[int, int]]:
+    # 只比较 CRC 与大小，无需解压
+    return {info.filename: (info.CRC, info.file_size) for info in archive.infolist() if not info.is_dir()}
+
+
+def diff(base: pathlib.Path, target: pathlib.Path) -> dict[str, list[str]]:
+    """
+    比较两个构建产物中的文件
+    :param base: 旧版本压缩包
+    :param target: 新版本压缩包
+    :return: {"added": [...], "changed": [...], "removed": [...]}
+    """
+    with zipfile.ZipFile(base) as old, zipfile.ZipFile(target) as new:
+        old_members, new_members = _members(old), _members(new)
+    return {
+        "added": sorted(name for name in new_members if name not in old_members),
+        "changed": sorted(
+            name for name in new_members if name in old_members and new_members[name] != old_members[name]
+        ),
+        "removed": sorted(name for name in old_members if name not in new_members),
+    }
+
+
+def build(base_number: int, base: pathlib.Path, target_number: int, target: pathlib.Path) -> pathlib.Path:
+    """
+    生成增量包：包含新增与变化的文件，以及记录差异的 delta.json
+    :param base_number: 旧版本构建号
+    :param base: 旧版本压缩包
+    :param target_number: 新版本构建号
+    :param target: 新版本压缩包
+    :return: 增量包路径（与新版本压缩包位于同一目录）
+    """
+    manifest = {"from": base_number, "to": target_number, **diff(base, target)}
+    output = target.with_name(delta_name(base_number))
+    # 临时文件名唯一，多个进程同时生成也不会互相覆盖，完成后原子地替换
+    fd, temp = tempfile.mkstemp(dir=output.parent, prefix=f".{output.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file, zipfile.ZipFile(target) as source, \
+                zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as bundle:
+            for name in manifest["added"] + manifest["changed"]:
+                info = source.getinfo(name)
+                with source.open(info) as src, bundle.open(info, "w") as dst:
+                    while chunk := src.read(1 << 16):
+                        dst.write(chunk)
+            bundle.writestr(MANIFEST, json.dumps(manifest, indent=4, ensure_ascii=False))
+        os.replace(temp, output)
+    except BaseException:
+        pathlib.Path(temp).unlink(missing_ok=True)
+        raise
+    logger.info(
+        f"生成增量包 #{base_number} -> #{target_number}：新增 {len(manifest['added'])}，"
+        f"变化 {len(manifest['changed'])}，删除 {len(manifest['removed'])}，{output.stat().st_size} 字节"
+    )
+    return output
+
+
+def build_all(builds: dict[int, pathlib.Path], target_number: int, depth: int):
+    """
+    为新版本生成相对于之前 depth 个版本的增量包
+    :param builds: 已镜像的构建，构建号 -> 压缩包路径
+    :param target_number: 新版本构建号
+    :param depth: 最多比较的旧版本数量
+    """
+    bases = sorted(number for number in builds if number < target_number)[-depth:] if depth > 0 else []
+    for base_number in bases:
+        try:
+            build(base_number, builds[base_number], target_number, builds[target_number])
+        except (zipfile.BadZipFile, OSError) as err:
+            logger.warning(f"生成增量包 #{base_number} -> #{target_number} 失败：{err}")
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+
+import orjson
+from loguru import logger
+
+from utils import bus
+from utils.store import Tree, store
+from utils.store.base import sort_key
+
+
+class DataIndex:
+    """
+    配置存储中学校/年级/班级结构的内存索引，避免每次请求都遍历目录
+    - 启动时扫描一次，此后由写入方调用 add 增量更新，定时任务 rescan 兜底发现手动改动
+    - 每次变化后 version 自增，etag 随内容变化
+    """
+
+    def __init__(self):
+        self.tree: Tree | None = None
+        self.version = 0
+        self.etag = ""
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _scan() -> Tree:
+        return store.tree()
+
+    def _replace(self, tree: Tree) -> bool:
+        etag = '"' + hashlib.blake2b(orjson.dumps(tree), digest_size=8).hexdigest() + '"'
+        self.tree = tree
+        if etag == self.etag:
+            return False
+        self.etag = etag
+        self.version += 1
+        return True
+
+    async def get(self) -> Tree:
+        """
+        获取目录树，首次调用时在线程池中扫描
+        """
+        if self.tree is None:
+            async with self._lock:
+                if self.tree is None:
+                    self._replace(await asyncio.to_thread(self._scan))
+        return self.tree
+
+    async def rescan(self):
+        """
+        重新扫描目录（在线程池中执行），内容变化时更新索引
+        """
+        tree = await asyncio.to_thread(self._scan)
+        async with self._lock:
+            if self._replace(tree):
+                logger.info(f"目录索引已更新：版本 {self.version}")
+
+    def _add(self, school: str, grade: str, cls: str | None = None):
+        if self.tree is None:
+            return
+        tree = {s: {g: list(c) for g, c in grades.items()} for s, grades in self.tree.items()}
+        classes = tree.setdefault(school, {}).setdefault(grade, [])
+        if cls is not None and cls not in classes:
+            classes.append(cls)
+            classes.sort(key=sort_key)
+        tree = {s: dict(sorted(grades.items(), key=lambda kv: sort_key(kv[0]))) for s, grades in tree.items()}
+        self._replace(dict(sorted(tree.items(), key=lambda kv: sort_key(kv[0]))))
+
+    async def add(self, school: str | int, grade: str | int, cls: str | int | None = None):
+        """
+        增量添加学校/年级/班级（已存在时不做改动），并通知其他 worker
+        """
+        await bus.publish("index", {"school": str(school), "grade": str(grade), "cls": None if cls is None else str(cls)})
+
+    def invalidate(self):
+        """
+        使索引失效，下次 get 时重新扫描
+        """
+        self.tree = None
+
+
+index = DataIndex()
+
+
+def _on_index(payload: dict):
+    index._add(payload["school"], payload["grade"], payload["cls"])
+
+
+bus.subscribe("index", _on_index)
@@ -0,0 +1,303 @@
+"""
+轻量的指标收集，输出 Prometheus 文本格式（不依赖 prometheus_client）
+- 记录操作只是对字典中的数值加减，适合在热路径上调用
+- 连接数等可随时计算的指标使用 collect 回调，在抓取时才计算
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+import anyio.to_thread
+
+from utils import timeseries
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, values: tuple) -> LabelValues:
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} 需要标签 {self.label_names}")
+        return tuple(str(v) for v in values)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+            self, name: str, documentation: str, labels: tuple[str, ...] = (),
+            collect: Callable[[], dict[LabelValues, float]] | None = None
+    ):
+        """
+        :param collect: 抓取时调用，返回 标签值 -> 数值；提供时忽略 set/inc 记录的值
+        """
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self) -> list[str]:
+        if self._collect is not None:
+            items = [(self._key(k), v) for k, v in self._collect().items()]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+            self, name: str, documentation: str, labels: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（不累加）..., +Inf 桶计数, 总和]
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        """
+        计时上下文管理器：with histogram.time("label"): ...
+        """
+        return _Timer(self, labels)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), row[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(row[-1])}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def timed(histogram: Histogram, *labels):
+    """
+    装饰器：记录同步函数的执行时间
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(*labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 正在处理的 HTTP 请求：id(scope) -> (scope, 开始时间)
+inflight: dict[int, tuple[dict, float]] = {}
+
+
+def inflight_requests() -> list[dict]:
+    """
+    正在处理的 HTTP 请求，按已耗时降序
+    """
+    now = time.perf_counter()
+    result = [
+        {
+            "method": scope["method"],
+            "route": getattr(scope.get("route"), "path", None),
+            "path": scope["path"],
+            "elapsed": round(now - start, 4),
+        }
+        for scope, start in list(inflight.values())
+    ]
+    return sorted(result, key=lambda r: r["elapsed"], reverse=True)
+
+
+def thread_pools() -> dict[str, dict[str, int]]:
+    """
+    线程池占用情况，需在事件循环线程中调用
+    - anyio：同步路由（def）与 run_in_threadpool 使用的令牌
+    - asyncio：asyncio.to_thread 使用的默认线程池（尚未创建时不返回）
+    :return: {"anyio": {"busy", "limit", "waiting"}, "asyncio": {"threads", "limit", "waiting"}}
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter().statistics()
+    result = {
+        "anyio": {
+            "busy": limiter.borrowed_tokens,
+            "limit": limiter.total_tokens,
+            "waiting": limiter.tasks_waiting,
+        }
+    }
+    # 标准库没有公开默认线程池的占用情况，只能读取私有属性
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    if executor is not None:
+        result["asyncio"] = {
+            "threads": len(executor._threads),
+            "limit": executor._max_workers,
+            "waiting": executor._work_queue.qsize(),
+        }
+    return result
+
+
+class MetricsMiddleware:
+    """
+    记录每个请求的次数与耗时，按路由模板（如 /{school}/{grade}/{class_number}）分组，避免路径参数造成标签爆炸
+    使用纯 ASGI 中间件而非 BaseHTTPMiddleware，不额外创建任务，也不影响流式响应
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        key = id(scope)
+        inflight[key] = (scope, start)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            inflight.pop(key, None)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, template, status)
+            timeseries.record("requests", template)
+            http_duration.observe(time.perf_counter() - start, method, template)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标 {metric.name} 已存在")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_requests = Counter("http_requests_total", "HTTP 请求数", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "HTTP 请求耗时", ("method", "route"))
+# 课表生成
+schedule_stage_duration = Histogram("schedule_stage_duration_seconds", "课表生成各阶段耗时", ("stage",))
+# WebSocket
+broadcast_duration = Histogram("websocket_broadcast_duration_seconds", "广播消息入队耗时", ("message",))
+broadcast_fanout = Counter("websocket_broadcast_messages_total", "广播消息的接收连接数", ("message",))
+outbox_dropped = Counter("ws_outbox_dropped_total", "发送队列已满而丢弃的消息数", ("policy",))
+# 事件循环
+loop_lag = Histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟", buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+loop_stalls = Counter("event_loop_stalls_total", "事件循环阻塞期间正在处理的请求", ("route",))
+# SQLite
+sqlite_duration = Histogram("sqlite_query_duration_seconds", "SQLite 操作耗时", ("operation",))
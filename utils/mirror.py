@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from loguru import logger
+
+from utils import ci, clients, delta
+from utils.config import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ARTIFACT_DIR = pathlib.Path("./data/ci/artifacts")
+BUILD_INFO = "build.json"
+LOCK_FILE = ".lock"
+
+# 构建号 -> 正在进行的下载任务，同一构建只下载一次
+_downloads: dict[int, asyncio.Task] = {}
+
+
+@contextmanager
+def _exclusive() -> Iterator[bool]:
+    """
+    镜像目录的跨进程锁（不等待）：多 worker 部署时只有拿到锁的进程下载、生成增量包与清理旧构建
+    :return: 是否拿到锁；未拿到说明其他进程正在镜像
+    """
+    ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(ARTIFACT_DIR / LOCK_FILE, "a+b") as file:
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def artifact_path(number: int, filename: str | None = None) -> pathlib.Path:
+    return ARTIFACT_DIR / str(number) / (filename or config.ci.filename)
+
+
+def mirrored(number: int) -> bool:
+    return artifact_path(number).is_file()
+
+
+def artifact_file(number: int, filename: str) -> pathlib.Path | None:
+    """
+    获取可供下载的镜像文件（完整包或增量包），不存在时返回 None
+    """
+    if filename != config.ci.filename and not (filename.startswith("delta-") and filename.endswith(".zip")):
+        return None
+    path = artifact_path(number, filename)
+    return path if path.is_file() and path.parent.parent == ARTIFACT_DIR else None
+
+
+def builds() -> list[int]:
+    """
+    已镜像的构建号，按从旧到新排序
+    """
+    if not ARTIFACT_DIR.exists():
+        return []
+    return sorted(
+        int(p.name) for p in ARTIFACT_DIR.iterdir()
+        if p.is_dir() and p.name.isdigit() and (p / config.ci.filename).is_file() and (p / BUILD_INFO).is_file()
+    )
+
+
+def build_date(number: int) -> str | None:
+    """
+    已镜像构建的构建日期
+    """
+    try:
+        return json.loads((ARTIFACT_DIR / str(number) / BUILD_INFO).read_text(encoding="utf-8"))["build_date"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_info(directory: pathlib.Path, build: dict):
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f".{BUILD_INFO}.", suffix=".part")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        json.dump({"number": build["number"], "build_date": build["build_date"]}, file, ensure_ascii=False)
+    os.replace(temp, directory / BUILD_INFO)
+
+
+async def _fetch(build: dict, target: pathlib.Path):
+    """
+    下载到同目录下名称唯一的临时文件，完成后原子地替换，读者与其他进程不会看到写了一半的文件
+    """
+    fd, temp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".part")
+    file = os.fdopen(fd, "wb")
+    try:
+        async with clients.client().stream("GET", build["url"], follow_redirects=True) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(1 << 16):
+                await asyncio.to_thread(file.write, chunk)
+        await asyncio.to_thread(file.close)
+        await asyncio.to_thread(_write_info, target.parent, build)
+        os.replace(temp, target)
+    except BaseException:
+        file.close()
+        pathlib.Path(temp).unlink(missing_ok=True)
+        raise
+
+
+async def _download(build: dict) -> pathlib.Path | None:
+    """
+    :return: 本地文件路径；其他进程正在镜像时返回 None
+    """
+    number = build["number"]
+    target = artifact_path(number)
+    with _exclusive() as owner:
+        if not owner:
+            logger.debug(f"其他进程正在镜像构建产物，跳过 #{number}")
+            return None
+        if mirrored(number):
+            # 拿到锁之前已由其他进程完成
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        logger.info(f"开始镜像构建产物 #{number}（{build['build_date']}）：{build['url']}")
+        await _fetch(build, target)
+        logger.success(f"构建产物 #{number} 镜像完成（{target.stat().st_size} 字节）")
+        await asyncio.to_thread(
+            delta.build_all, {n: artifact_path(n) for n in builds()}, number, config.ci.delta_depth
+        )
+        await asyncio.to_thread(_prune, number)
+    return target
+
+
+def _prune(current: int):
+    """
+    清理旧构建，需持有镜像锁（此时没有其他进程在写入镜像目录）
+    :param current: 刚镜像完成的构建号，无论 mirror_keep 如何设置都会保留
+    """
+    keep = set(builds()[-config.ci.mirror_keep:]) if config.ci.mirror_keep > 0 else set()
+    keep.add(current)
+    for path in ARTIFACT_DIR.iterdir():
+        # 旧版本按构建日期命名的目录（没有 build.json）一并清理
+        if path.is_dir() and (not path.name.isdigit() or int(path.name) not in keep):
+            logger.info(f"清理旧的构建产物镜像：{path.name}")
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _log_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"镜像构建产物失败，客户端将直接从 CI 下载：{task.exception()!r}")
+
+
+def _start(build: dict) -> asyncio.Task:
+    """
+    在后台镜像某个构建，同一构建已在下载时返回进行中的任务；任务在完成前由 _downloads 持有，失败时记录日志
+    """
+    number = build["number"]
+    task = _downloads.get(number)
+    if task is None:
+        task = asyncio.ensure_future(_download(build))
+        _downloads[number] = task
+        task.add_done_callback(lambda _: _downloads.pop(number, None))
+        task.add_done_callback(_log_error)
+    return task
+
+
+async def ensure(build: dict) -> pathlib.Path | None:
+    """
+    确保某个构建已镜像到本地（同一构建的并发调用只会下载一次）；构建号变化即视为新构建，同一天的多次构建互不影响
+    :param build: 构建信息，需包含 number、build_date 与 url（固定到该构建号的产物地址）
+    :return: 本地文件路径；其他进程正在镜像时返回 None
+    """
+    number = build["number"]
+    if mirrored(number):
+        return artifact_path(number)
+    return await asyncio.shield(_start(build))
+
+
+async def refresh():
+    """
+    定时任务：重新验证构建信息，并镜像最新的构建产物
+    """
+    await ci.refresh()
+    if not config.ci.mirror:
+        return
+    build = ci.build_cache.peek((config.ci.url, config.ci.filename))
+    if build is None or build[0].get("number") is None:
+        return
+    if not mirrored(build[0]["number"]):
+        # 失败时由 _log_error 记录日志
+        await asyncio.wait([_start(build[0])])
+
+
+def _base_number(base_number: int | None, base_date: str | None) -> int | None:
+    """
+    客户端当前的构建号；只提供构建日期时，仅当本机镜像中该日期恰好只有一个构建才能确定
+    """
+    if base_number is not None or base_date is None:
+        return base_number
+    matches = [number for number in builds() if build_date(number) == base_date]
+    return matches[0] if len(matches) == 1 else None
+
+
+def resolve(build: dict, base_url: str, base: str | None = None, base_number: int | None = None) -> dict:
+    """
+    获取客户端应使用的下载方式：优先使用本机镜像中体积最小的包，未镜像时返回 CI 地址并在后台开始镜像
+    :param build: get_from_jenkins 返回的构建信息
+    :param base_url: 本服务的访问地址，以 / 结尾
+    :param base: 客户端当前的构建日期（旧版客户端），无法唯一确定构建时不使用增量包
+    :param base_number: 客户端当前的构建号，提供时优先于 base
+    :return: {"url": 下载地址, "package": "full" 或 "delta", "size": 字节数（未知时为 None）}
+    """
+    number = build.get("number")
+    if not config.ci.mirror or number is None:
+        return {"url": build["url"], "package": "full", "size": None}
+    if not mirrored(number):
+        _start(build)
+        return {"url": build["url"], "package": "full", "size": None}
+    candidates = [(artifact_path(number), "full")]
+    base_number = _base_number(base_number, base)
+    if base_number is not None and base_number != number:
+        candidates.append((artifact_path(number, delta.delta_name(base_number)), "delta"))
+    path, package, size = min(
+        ((path, package, path.stat().st_size) for path, package in candidates if path.is_file()),
+        key=lambda item: item[2]
+    )
+    return {"url": f"{base_url}api/update/artifact/{number}/{path.name}", "package": package, "size": size}
@@ -0,0 +1,138 @@
+"""
+事件循环延迟与线程池占用监控
+- 心跳协程每隔 interval 醒来一次，实际醒来时间与预期的差值即为调度延迟
+- 看门狗线程发现心跳长时间未更新时，立即抓取事件循环线程的调用栈，定位正在阻塞的代码
+- 延迟超过阈值时记录当时正在处理的请求，可直接看出是哪个路由阻塞了所有 WebSocket 通信
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from loguru import logger
+
+from utils import metrics
+from utils.config import config
+
+_task: asyncio.Task | None = None
+_watchdog: "Watchdog | None" = None
+_beat: float = 0.0  # 心跳最后一次运行的时间
+_last_warning: dict[str, float] = {}
+_stalls: deque[dict] = deque(maxlen=20)
+_stats = {"last_lag": 0.0, "max_lag": 0.0, "stalls": 0, "pool_warnings": 0}
+
+
+def _warn(kind: str, message: str):
+    """
+    同类警告在 warn_interval 内只输出一次
+    """
+    now = time.monotonic()
+    if now - _last_warning.get(kind, -config.monitor.warn_interval) >= config.monitor.warn_interval:
+        _last_warning[kind] = now
+        logger.warning(message)
+
+
+def _format_stack(frame, limit: int = 12) -> list[str]:
+    return [
+        f"{entry.filename}:{entry.lineno} {entry.name}"
+        for entry in traceback.extract_stack(frame)[-limit:]
+    ]
+
+
+class Watchdog(threading.Thread):
+    """
+    在事件循环被阻塞的当下抓取其调用栈（阻塞结束后再看已经来不及了）
+    """
+
+    def __init__(self, loop_thread: int):
+        super().__init__(name="loop-watchdog", daemon=True)
+        self.loop_thread = loop_thread
+        # 本次阻塞期间抓到的调用栈与正在处理的请求，由心跳协程取走
+        # 需在阻塞当下记录请求：阻塞结束后，阻塞者可能先于心跳协程完成并离开 inflight
+        self.stack: list[str] | None = None
+        self.requests: list[dict] | None = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(config.monitor.lag_warning / 2):
+            if self.stack is None and time.perf_counter() - _beat > config.monitor.interval + config.monitor.lag_warning:
+                frame = sys._current_frames().get(self.loop_thread)
+                if frame is not None:
+                    self.requests = metrics.inflight_requests()
+                    self.stack = _format_stack(frame)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _check_pools():
+    pools = metrics.thread_pools()
+    anyio_pool = pools["anyio"]
+    if anyio_pool["busy"] / anyio_pool["limit"] >= config.monitor.pool_warning or anyio_pool["waiting"]:
+        _stats["pool_warnings"] += 1
+        _warn(
+            "anyio",
+            f"同步路由线程池占用 {anyio_pool['busy']}/{anyio_pool['limit']}，"
+            f"{anyio_pool['waiting']} 个任务排队，正在处理的请求：{metrics.inflight_requests()[:5]}"
+        )
+    asyncio_pool = pools.get("asyncio")
+    if asyncio_pool is not None and asyncio_pool["waiting"] > 0:
+        _stats["pool_warnings"] += 1
+        _warn(
+            "asyncio",
+            f"asyncio.to_thread 线程池已满（{asyncio_pool['limit']} 个线程），{asyncio_pool['waiting']} 个任务排队"
+        )
+
+
+async def _heartbeat():
+    global _beat
+    interval = config.monitor.interval
+    while True:
+        _beat = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - _beat - interval)
+        metrics.loop_lag.observe(lag)
+        _stats["last_lag"] = round(lag, 4)
+        _stats["max_lag"] = max(_stats["max_lag"], round(lag, 4))
+        stack, requests = _watchdog.stack, _watchdog.requests
+        _watchdog.stack = _watchdog.requests = None
+        if lag >= config.monitor.lag_warning:
+            if requests is None:
+                requests = metrics.inflight_requests()
+            for request in requests:
+                metrics.loop_stalls.inc(request["route"] or "unmatched")
+            _stats["stalls"] += 1
+            _stalls.append({"time": time.time(), "lag": round(lag, 4), "requests": requests, "stack": stack})
+            logger.warning(
+                f"事件循环阻塞 {lag * 1000:.0f} ms，期间正在处理的请求：{requests or '无'}"
+                + ("，阻塞位置：\n  " + "\n  ".join(stack) if stack else "")
+            )
+        _check_pools()
+
+
+def start():
+    """
+    启动监控（需在事件循环中调用）
+    """
+    global _task, _watchdog
+    if not config.monitor.enabled:
+        return
+    _watchdog = Watchdog(threading.get_ident())
+    _watchdog.start()
+    _task = asyncio.create_task(_heartbeat())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    if _watchdog is not None:
+        _watchdog.stop()
+
+
+def stats() -> dict:
+    return {**_stats, "recent_stalls": list(_stalls)}
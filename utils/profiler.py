@@ -0,0 +1,152 @@
+"""
+线上按需性能分析：采样式 CPU 分析、cProfile 与 tracemalloc 内存快照对比
+同一时间只允许进行一项分析，避免多个分析器互相干扰
+"""
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+class Busy(Exception):
+    """
+    已有分析正在进行
+    """
+
+
+_lock = asyncio.Lock()
+
+
+def _frame_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """
+    后台线程定时读取所有线程的调用栈，统计相同调用栈出现的次数
+    与 cProfile 不同，开销只取决于采样间隔，不会拖慢被分析的代码
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.stacks[f"{names.get(ident, ident)};{_frame_stack(frame)}"] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """
+        折叠栈格式（每行 "线程;帧;帧... 次数"），可直接交给 flamegraph.pl / speedscope 生成火焰图
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def sample(seconds: float, interval: float) -> tuple[str, int]:
+    """
+    采样式 CPU 分析
+    :param seconds: 分析时长（秒）
+    :param interval: 采样间隔（秒）
+    :return: (折叠栈文本, 采样次数)
+    """
+    if _lock.locked():
+        raise Busy
+    async with _lock:
+        sampler = Sampler(interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        return sampler.collapsed(), sampler.samples
+
+
+async def profile(seconds: float, sort: str, limit: int) -> str:
+    """
+    使用 cProfile 分析事件循环线程（所有协程与异步路由都在该线程中执行）
+    :param seconds: 分析时长（秒）
+    :param sort: pstats 排序字段，如 cumulative、tottime
+    :param limit: 输出的函数数量
+    :return: pstats 文本报告
+    """
+    if _lock.locked():
+        raise Busy
+    async with _lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+async def memory(seconds: float, limit: int, frames: int) -> dict:
+    """
+    对比一段时间前后的 tracemalloc 快照，找出内存增长最多的位置
+    :param seconds: 两次快照的间隔（秒）
+    :param limit: 返回的条目数量
+    :param frames: 记录的调用栈深度（仅在本次开启 tracemalloc 时生效）
+    :return: 当前与峰值的跟踪内存，以及按增长量排序的分配位置
+    """
+    if _lock.locked():
+        raise Busy
+    async with _lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started:
+                tracemalloc.stop()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = await asyncio.to_thread(
+            lambda: after.filter_traces(filters).compare_to(before.filter_traces(filters), "traceback")
+        )
+        return {
+            "seconds": seconds,
+            "current": current,
+            "peak": peak,
+            "time": time.time(),
+            "top": [
+                {
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                    "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                }
+                for stat in diff[:limit]
+            ],
+        }
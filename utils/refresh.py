@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+from utils.config import config
+
+
+class Overloaded(Exception):
+    """
+    课表生成排队超时
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"排队超时，建议 {retry_after:.1f} 秒后重试")
+        self.retry_after = retry_after
+
+
+class RefreshPlanner:
+    """
+    根据实测的课表生成耗时估算服务器处理能力：
+    - 为 SyncConfig 广播的每个连接分配错开的刷新延迟，使重新拉取的请求均匀分布在有限的窗口内
+    - 对课表生成做准入控制，限制并发并在排队过久时拒绝请求
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.avg_duration = 0.05  # 单次课表生成耗时的指数滑动平均（秒），启动时的保守估计
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self._cursor = 0.0  # 已分配出去的刷新时间槽的末尾（time.monotonic）
+        self._semaphore = asyncio.Semaphore(config.refresh.concurrency)
+
+    @property
+    def slot(self) -> float:
+        """
+        每个刷新请求占用的时间槽长度（秒）
+        """
+        return self.avg_duration / max(config.refresh.concurrency, 1)
+
+    def observe(self, seconds: float):
+        """
+        记录一次课表生成耗时
+        """
+        self.avg_duration += self.alpha * (seconds - self.avg_duration)
+
+    def allocate(self, count: int) -> list[float]:
+        """
+        为一批连接分配刷新延迟
+        :param count: 连接数
+        :return: 每个连接的刷新延迟（秒），已打乱顺序，最大不超过 max_window
+        """
+        if count <= 0:
+            return []
+        now = time.monotonic()
+        window = config.refresh.max_window
+        offset = max(self._cursor - now, 0.0)
+        slot = self.slot
+        if offset + count * slot > window:
+            # 窗口内排不下：将这一批均匀分散到整个窗口，而不是把超出的部分都挤在窗口末尾同时刷新
+            offset, slot = 0.0, window / count
+        delays = [offset + (i + random.random()) * slot for i in range(count)]
+        random.shuffle(delays)
+        self._cursor = max(self._cursor, now + offset + count * slot)
+        return delays
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        准入控制：限制同时生成课表的数量，排队超过 queue_timeout 时抛出 Overloaded
+        """
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), config.refresh.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(
+                self.slot * (self.waiting + self.running) * (1 + random.random())
+            )
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "avg_duration": round(self.avg_duration, 4),
+            "waiting": self.waiting,
+            "running": self.running,
+            "rejected": self.rejected,
+            "backlog": round(max(self._cursor - time.monotonic(), 0.0), 3),
+        }
+
+
+planner = RefreshPlanner()
@@ -1,6 +1,8 @@
 import asyncio
 
 from utils.db import refresh_statuses
+from utils.metrics import schedule_stage_duration
+from utils.trace import span
 from . import resolve, fix
 
 
@@ -11,8 +13,10 @@ async def run_fix(schedule: dict) -> dict:
     :return: 修复完成后的数据
     """
     # 先按默认格式校验/填充，再修正作息与课时数不匹配
-    s = await fix.ensure_default_shape(schedule)
-    s = await fix.fix_wrong_timetable(s)
+    with span("ensure_default_shape", schedule_stage_duration):
+        s = await fix.ensure_default_shape(schedule)
+    with span("fix_wrong_timetable", schedule_stage_duration):
+        s = await fix.fix_wrong_timetable(s)
     return s
 
 async def run_resolve(schedule: dict, *, school: str, grade: int | str, class_number: int | str) -> dict:
@@ -25,13 +29,19 @@ async def run_resolve(schedule: dict, *, school: str, grade: int | str, class_nu
     :return: 解析完成后的数据
     """
     # 每次解析前刷新数据库状态，保证客户端拉取配置时状态最新
-    await asyncio.to_thread(refresh_statuses)
-    s = await resolve.resolve_week_cycle(schedule)
-    s = await resolve.resolve_compensation(s, school=school, grade=grade, class_number=class_number)
-    s = await resolve.resolve_timetable(s, school=school, grade=grade, class_number=class_number)
+    with span("refresh_statuses", schedule_stage_duration):
+        await asyncio.to_thread(refresh_statuses)
+    with span("resolve_week_cycle", schedule_stage_duration):
+        s = await resolve.resolve_week_cycle(schedule)
+    with span("resolve_compensation", schedule_stage_duration):
+        s = await resolve.resolve_compensation(s, school=school, grade=grade, class_number=class_number)
+    with span("resolve_timetable", schedule_stage_duration):
+        s = await resolve.resolve_timetable(s, school=school, grade=grade, class_number=class_number)
     # 新增：课程表调整与全部调整（按需覆盖）
-    s = await resolve.resolve_schedule(s, school=school, grade=grade, class_number=class_number)
-    s = await resolve.resolve_all(s, school=school, grade=grade, class_number=class_number)
+    with span("resolve_schedule", schedule_stage_duration):
+        s = await resolve.resolve_schedule(s, school=school, grade=grade, class_number=class_number)
+    with span("resolve_all", schedule_stage_duration):
+        s = await resolve.resolve_all(s, school=school, grade=grade, class_number=class_number)
     return s
 
 async def run_all(schedule: dict, *, school: str, grade: int | str, class_number: int | str) -> dict:
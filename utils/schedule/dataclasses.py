@@ -1,7 +1,7 @@
 from enum import IntEnum
 
 from pydantic import BaseModel
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional
 
 
 class DailyClass(BaseModel):
@@ -36,6 +36,10 @@ class Setting(BaseModel):
     banner_text: str
     css_style: Dict[str, str]
 
+class WeatherCity(BaseModel):
+    name: str
+    province: Optional[str] = None
+
 class AutorunType(IntEnum):
     COMPENSATION = 0  # 调休
     TIMETABLE = 1  # 作息表调整
@@ -0,0 +1,90 @@
+import asyncio
+import datetime
+
+from loguru import logger
+
+from utils.globalvar import websocket_clients
+from utils.store import store
+from . import resolve
+
+# (school, grade, class_number) -> (日期, 当日最后一节课的开始时间)，仅保存已连接的班级
+_table: dict[tuple[str, int, int], tuple[datetime.date, datetime.time | None]] = {}
+# 正在计算的班级，同一班级的并发查询（如部署后大量连接同时重连）只计算一次
+_pending: dict[tuple[str, int, int], asyncio.Task] = {}
+
+
+def _compute_sync(school: str, grade: int, class_number: int) -> datetime.time | None:
+    """
+    同步实现：计算今日最后一节课的开始时间（已应用调休、作息表调整等自动任务）
+    """
+    schedule = {
+        **store.read("timetable", school, grade),
+        **store.read("schedule", school, grade, class_number)
+    }
+    kwargs = {'school': school, 'grade': grade, 'class_number': class_number}
+    schedule = resolve._resolve_compensation_sync(schedule, **kwargs)
+    schedule = resolve._resolve_timetable_sync(schedule, **kwargs)
+    schedule = resolve._resolve_all_sync(schedule, **kwargs)
+    today_idx = datetime.date.today().isoweekday() % 7  # 星期日为 0，星期六为 6
+    periods = list(schedule["timetable"][schedule["daily_class"][today_idx]["timetable"]].keys())
+    if not periods:
+        return None
+    return datetime.time.fromisoformat(periods[-1].split("-")[0])
+
+
+async def refresh(school: str, grade: int, class_number: int) -> datetime.time | None:
+    """
+    重新计算某班级今日的放学时间并写入表中
+    :return: 今日最后一节课的开始时间，无法计算时为 None
+    """
+    today = datetime.date.today()
+    try:
+        finish_time = await asyncio.to_thread(_compute_sync, school, grade, class_number)
+    except Exception as err:
+        logger.warning(f"计算 {school} 学校 {grade} 级 {class_number} 班的放学时间失败：{err}")
+        finish_time = None
+    _table[(school, grade, class_number)] = (today, finish_time)
+    return finish_time
+
+
+async def lookup(school: str, grade: int, class_number: int) -> datetime.time | None:
+    """
+    查询某班级今日的放学时间，表中缺失或已过期（跨天）时才重新计算，同一班级同时只计算一次
+    :return: 今日最后一节课的开始时间，无法计算时为 None
+    """
+    key = (school, grade, class_number)
+    entry = _table.get(key)
+    if entry is not None and entry[0] == datetime.date.today():
+        return entry[1]
+    task = _pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(refresh(school, grade, class_number))
+        _pending[key] = task
+        task.add_done_callback(lambda _: _pending.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def discard(school: str, grade: int, class_number: int):
+    """
+    班级的所有连接均已断开时移出表
+    """
+    _table.pop((school, grade, class_number), None)
+
+
+async def refresh_grade(school: str, grade: int):
+    """
+    配置或自动任务变更后，重新计算该年级所有已连接班级的放学时间
+    """
+    mgr = websocket_clients.get((school, grade))
+    if mgr is None:
+        return
+    for class_number in {c for (_s, _g, c) in mgr.class_map}:
+        await refresh(school, grade, class_number)
+
+
+async def refresh_connected():
+    """
+    重新计算所有已连接班级的放学时间（每日零点执行）
+    """
+    for (school, grade) in list(websocket_clients.keys()):
+        await refresh_grade(school, grade)
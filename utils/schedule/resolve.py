@@ -6,7 +6,7 @@ from typing import Dict, Any, List, Tuple
 
 from loguru import logger
 
-from utils.calc import weeks, from_str_to_date
+from utils import term
 from utils.db import fetch_records
 from utils.schedule.dataclasses import AutorunType
 
@@ -16,14 +16,14 @@ def _resolve_week_cycle_sync(schedule: dict) -> dict:
     同步实现：处理单双周逻辑
     """
     resp = schedule.copy()
-    week = weeks(from_str_to_date(schedule['start']))
+    day = term.day(schedule['start'])
     for i, lst in enumerate(schedule['daily_class']):
         for j, item in enumerate(lst['classList']):
             if isinstance(item, list):
                 resp['daily_class'][i]['classList'][j] = resp['daily_class'][i]['classList'][j][
-                    (week - 1) % len(resp['daily_class'][i]['classList'][j])
+                    day.cycle(len(resp['daily_class'][i]['classList'][j]))
                 ]
-                logger.debug(f"第 {week} 周 | {item} -> {resp['daily_class'][i]['classList'][j]}")
+                logger.debug(f"第 {day.week} 周 | {item} -> {resp['daily_class'][i]['classList'][j]}")
     return resp
 
 
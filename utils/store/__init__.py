@@ -0,0 +1,27 @@
+from utils.config import config, Storage
+from utils.store.base import (
+    CLASS_DOCUMENTS,
+    GRADE_DOCUMENTS,
+    DocumentNotFound,
+    Store,
+    Tree,
+)
+from utils.store.buffered import BufferedStore
+from utils.store.json_store import JsonStore
+from utils.store.sqlite_store import SqliteStore
+
+
+def create(storage: Storage) -> Store:
+    """
+    按配置创建存储后端
+    """
+    match storage.backend:
+        case "json":
+            return JsonStore(storage.root)
+        case "sqlite":
+            return SqliteStore(storage.database)
+        case _:
+            raise ValueError(f"未知的存储方式：{storage.backend}")
+
+
+store = BufferedStore(create(config.storage), config.storage.flush_delay, wait=config.cluster.enabled)
@@ -0,0 +1,96 @@
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+# 年级级别的文档：./data/<school>/<grade>/<kind>.json
+GRADE_DOCUMENTS = ("subjects", "timetable")
+# 班级级别的文档：./data/<school>/<grade>/<class>/<kind>.json
+CLASS_DOCUMENTS = ("config", "schedule", "weather")
+
+Tree = dict[str, dict[str, list[str]]]  # 学校 -> 年级 -> 班级
+
+
+class DocumentNotFound(FileNotFoundError):
+    """
+    文档不存在（继承 FileNotFoundError，与原先直接读取文件时的行为保持一致）
+    """
+
+
+def sort_key(name: str) -> tuple[int, int | str]:
+    return (0, int(name)) if name.isdigit() else (1, name)
+
+
+def check_kind(kind: str, cls: Any) -> None:
+    if kind in GRADE_DOCUMENTS:
+        if cls is not None:
+            raise ValueError(f"{kind} 是年级级别的文档，不应指定班级")
+    elif kind in CLASS_DOCUMENTS:
+        if cls is None:
+            raise ValueError(f"{kind} 是班级级别的文档，必须指定班级")
+    else:
+        raise ValueError(f"未知的文档类型：{kind}")
+
+
+class Store(ABC):
+    """
+    学校/年级/班级配置文档的存储接口
+    - 年级文档：subjects、timetable；班级文档：config、schedule、weather
+    - 文档内容均为 dict，读取不存在的文档时抛出 DocumentNotFound
+    """
+
+    @abstractmethod
+    def read(self, kind: str, school: str | int, grade: str | int, cls: str | int | None = None) -> dict:
+        """
+        读取文档
+        :param kind: 文档类型
+        :param school: 学校
+        :param grade: 年级
+        :param cls: 班级，年级文档为 None
+        :return: 文档内容
+        """
+
+    @abstractmethod
+    def write(self, kind: str, data: dict, school: str | int, grade: str | int, cls: str | int | None = None) -> int:
+        """
+        写入文档（不存在时创建）
+        :param kind: 文档类型
+        :param data: 文档内容
+        :return: 写入后的版本号
+        """
+
+    @abstractmethod
+    def exists(self, kind: str, school: str | int, grade: str | int, cls: str | int | None = None) -> bool:
+        ...
+
+    @abstractmethod
+    def version(self, kind: str, school: str | int, grade: str | int, cls: str | int | None = None) -> int:
+        """
+        文档的版本号，每次写入后变大，不存在时为 0
+        """
+
+    @abstractmethod
+    def schools(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    def grades(self, school: str | int) -> list[str]:
+        ...
+
+    @abstractmethod
+    def classes(self, school: str | int, grade: str | int) -> list[str]:
+        ...
+
+    @abstractmethod
+    def documents(self) -> Iterator[tuple[str, str, str, str | None, dict]]:
+        """
+        遍历所有文档，用于迁移
+        :return: (kind, school, grade, cls, data)
+        """
+
+    def tree(self) -> Tree:
+        return {
+            school: {grade: self.classes(school, grade) for grade in self.grades(school)}
+            for school in self.schools()
+        }
+
+    def close(self):
+        pass
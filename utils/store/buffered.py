@@ -0,0 +1,135 @@
+import asyncio
+from typing import Iterator
+
+import orjson
+from loguru import logger
+
+from utils.store.base import Store, check_kind, sort_key
+
+Key = tuple[str, str, str, str | None]  # (kind, school, grade, cls)
+
+
+class BufferedStore(Store):
+    """
+    在存储后端之前增加一层写缓冲：
+    - put 立即更新内存中的值，之后的读取直接返回新值，无需等待落盘
+    - 落盘在线程池中进行，不阻塞事件循环
+    - 同一文档在 flush_delay 内的多次保存只写一次
+    """
+
+    def __init__(self, backend: Store, flush_delay: float, wait: bool = False):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self.wait = wait  # 多 worker 部署时其他进程只能从后端读到新值，put 需等待落盘
+        self._pending: dict[Key, bytes] = {}  # 尚未落盘的文档（序列化后保存，读取时返回新对象）
+        self._generation: dict[Key, int] = {}  # 每次 put 加一，用于判断落盘期间是否又有新值
+        self._flushes: dict[Key, asyncio.Task] = {}
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(kind, school, grade, cls) -> Key:
+        check_kind(kind, cls)
+        return kind, str(school), str(grade), None if cls is None else str(cls)
+
+    def read(self, kind, school, grade, cls=None) -> dict:
+        pending = self._pending.get(self._key(kind, school, grade, cls))
+        if pending is not None:
+            return orjson.loads(pending)
+        return self.backend.read(kind, school, grade, cls)
+
+    def write(self, kind, data, school, grade, cls=None) -> int:
+        """
+        同步写入后端（供命令行工具等非事件循环场景使用）
+        """
+        key = self._key(kind, school, grade, cls)
+        self._pending.pop(key, None)
+        return self.backend.write(kind, data, school, grade, cls)
+
+    async def put(self, kind: str, data: dict, school, grade, cls=None):
+        """
+        保存文档：立即更新内存中的值，并在后台合并写入后端
+        :param kind: 文档类型
+        :param data: 文档内容
+        """
+        key = self._key(kind, school, grade, cls)
+        self._pending[key] = orjson.dumps(data)
+        self._generation[key] = self._generation.get(key, 0) + 1
+        task = self._flushes.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._flush(key))
+            self._flushes[key] = task
+        else:
+            self.coalesced += 1
+        if self.wait:
+            await asyncio.shield(task)
+
+    async def _flush(self, key: Key):
+        kind, school, grade, cls = key
+        await asyncio.sleep(self.flush_delay)
+        while key in self._pending:
+            generation = self._generation[key]
+            data = orjson.loads(self._pending[key])
+            try:
+                await asyncio.to_thread(self.backend.write, kind, data, school, grade, cls)
+                self.writes += 1
+            except Exception as err:
+                # 保留内存中的值，下次保存或关闭程序时重试
+                self.errors += 1
+                logger.exception(f"保存 {kind}（{school}/{grade}{'/' + cls if cls else ''}）失败：{err}")
+                return
+            if self._generation[key] == generation:
+                self._pending.pop(key, None)
+
+    async def flush(self):
+        """
+        等待所有未落盘的文档写入完成（程序关闭时调用）
+        """
+        for key in list(self._pending):
+            if key not in self._flushes or self._flushes[key].done():
+                self._flushes[key] = asyncio.create_task(self._flush(key))
+        await asyncio.gather(*self._flushes.values(), return_exceptions=True)
+
+    def generation(self, kind, school, grade, cls=None) -> int:
+        """
+        本进程内该文档被 put 的次数，配合 version 判断文档是否可能已变化
+        """
+        return self._generation.get(self._key(kind, school, grade, cls), 0)
+
+    def exists(self, kind, school, grade, cls=None) -> bool:
+        return self._key(kind, school, grade, cls) in self._pending or self.backend.exists(kind, school, grade, cls)
+
+    def version(self, kind, school, grade, cls=None) -> int:
+        return self.backend.version(kind, school, grade, cls)
+
+    def schools(self) -> list[str]:
+        return sorted(set(self.backend.schools()) | {k[1] for k in list(self._pending)}, key=sort_key)
+
+    def grades(self, school) -> list[str]:
+        school = str(school)
+        return sorted(
+            set(self.backend.grades(school)) | {k[2] for k in list(self._pending) if k[1] == school}, key=sort_key
+        )
+
+    def classes(self, school, grade) -> list[str]:
+        school, grade = str(school), str(grade)
+        return sorted(
+            set(self.backend.classes(school, grade))
+            | {k[3] for k in list(self._pending) if k[1] == school and k[2] == grade and k[3] is not None},
+            key=sort_key
+        )
+
+    def documents(self) -> Iterator[tuple[str, str, str, str | None, dict]]:
+        yield from self.backend.documents()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,98 @@
+import json
+import os
+import pathlib
+import tempfile
+from typing import Iterator
+
+from utils.store.base import CLASS_DOCUMENTS, GRADE_DOCUMENTS, DocumentNotFound, Store, check_kind, sort_key
+
+# 根目录下不属于学校的目录
+RESERVED = {"ci"}
+
+
+def _atomic_write(path: pathlib.Path, content: bytes):
+    """
+    先写入同目录下的临时文件并 fsync，再原子地替换目标文件，读者不会读到写了一半的文件
+    """
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        pathlib.Path(temp).unlink(missing_ok=True)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # 同步目录项，确保重命名本身也已落盘
+        dir_fd = os.open(path.parent, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class JsonStore(Store):
+    """
+    原有的 JSON 目录树存储：./data/<school>/<grade>/[<class>/]<kind>.json
+    版本号取文件的修改时间（纳秒）
+    """
+
+    def __init__(self, root: str):
+        self.root = pathlib.Path(root)
+
+    def path(self, kind: str, school: str | int, grade: str | int, cls: str | int | None = None) -> pathlib.Path:
+        check_kind(kind, cls)
+        base = self.root / str(school) / str(grade)
+        if cls is not None:
+            base = base / str(cls)
+        return base / f"{kind}.json"
+
+    def read(self, kind, school, grade, cls=None) -> dict:
+        path = self.path(kind, school, grade, cls)
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise DocumentNotFound(f"未找到 {path}")
+
+    def write(self, kind, data, school, grade, cls=None) -> int:
+        path = self.path(kind, school, grade, cls)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8"))
+        return path.stat().st_mtime_ns
+
+    def exists(self, kind, school, grade, cls=None) -> bool:
+        return self.path(kind, school, grade, cls).is_file()
+
+    def version(self, kind, school, grade, cls=None) -> int:
+        try:
+            return self.path(kind, school, grade, cls).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _dirs(path: pathlib.Path) -> list[str]:
+        if not path.is_dir():
+            return []
+        return sorted((p.name for p in path.iterdir() if p.is_dir() and not p.name.startswith(".")), key=sort_key)
+
+    def schools(self) -> list[str]:
+        return [school for school in self._dirs(self.root) if school not in RESERVED]
+
+    def grades(self, school) -> list[str]:
+        return self._dirs(self.root / str(school))
+
+    def classes(self, school, grade) -> list[str]:
+        return self._dirs(self.root / str(school) / str(grade))
+
+    def documents(self) -> Iterator[tuple[str, str, str, str | None, dict]]:
+        for school in self.schools():
+            for grade in self.grades(school):
+                for kind in GRADE_DOCUMENTS:
+                    if self.exists(kind, school, grade):
+                        yield kind, school, grade, None, self.read(kind, school, grade)
+                for cls in self.classes(school, grade):
+                    for kind in CLASS_DOCUMENTS:
+                        if self.exists(kind, school, grade, cls):
+                            yield kind, school, grade, cls, self.read(kind, school, grade, cls)
@@ -0,0 +1,51 @@
+"""
+在存储后端之间迁移配置文档，例如将现有的 JSON 目录树导入 SQLite：
+
+    python -m utils.store.migrate --from json --to sqlite
+
+迁移完成后将配置文件中的 [storage].backend 改为目标后端并重启即可。
+"""
+import argparse
+
+from loguru import logger
+
+from utils.config import Storage, config
+from utils.store import SqliteStore, create
+
+
+def migrate(source: Storage, target: Storage) -> int:
+    """
+    将 source 中的所有文档写入 target（目标为 SQLite 时在同一事务中完成）
+    :return: 迁移的文档数量
+    """
+    src, dst = create(source), create(target)
+    try:
+        documents = list(src.documents())
+        if isinstance(dst, SqliteStore):
+            return dst.write_many(documents)
+        for kind, school, grade, cls, data in documents:
+            dst.write(kind, data, school, grade, cls)
+        return len(documents)
+    finally:
+        src.close()
+        dst.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在存储后端之间迁移配置文档")
+    parser.add_argument("--from", dest="source", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--to", dest="target", choices=["json", "sqlite"], default="sqlite")
+    parser.add_argument("--root", default=config.storage.root, help="JSON 目录树根目录")
+    parser.add_argument("--database", default=config.storage.database, help="SQLite 数据库文件")
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("--from 与 --to 不能相同")
+    count = migrate(
+        Storage(backend=args.source, root=args.root, database=args.database),
+        Storage(backend=args.target, root=args.root, database=args.database),
+    )
+    logger.success(f"已将 {count} 个文档从 {args.source} 迁移到 {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator
+
+import orjson
+
+from utils.metrics import sqlite_duration, timed
+from utils.store.base import DocumentNotFound, Store, check_kind, sort_key
+
+
+class SqliteStore(Store):
+    """
+    SQLite 存储：所有文档保存在 documents 表中，写入在事务中完成，每次写入版本号加一
+    班级字段为空字符串时表示年级文档
+    """
+
+    def __init__(self, database: str):
+        os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+        self.database = database
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                school TEXT NOT NULL,
+                grade TEXT NOT NULL,
+                cls TEXT NOT NULL DEFAULT '',
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (school, grade, cls, kind)
+            )
+        ''')
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(kind, school, grade, cls) -> tuple[str, str, str, str]:
+        check_kind(kind, cls)
+        return str(school), str(grade), "" if cls is None else str(cls), kind
+
+    @timed(sqlite_duration, "store_read")
+    def read(self, kind, school, grade, cls=None) -> dict:
+        key = self._key(kind, school, grade, cls)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE school = ? AND grade = ? AND cls = ? AND kind = ?", key
+            ).fetchone()
+        if row is None:
+            raise DocumentNotFound(f"未找到 {'/'.join(k for k in key if k)}")
+        return orjson.loads(row[0])
+
+    def _upsert(self, key: tuple[str, str, str, str], data: dict) -> int:
+        return self._conn.execute(
+            '''
+            INSERT INTO documents (school, grade, cls, kind, data, version, updated) VALUES (?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT (school, grade, cls, kind) DO UPDATE SET
+                data = excluded.data, version = documents.version + 1, updated = excluded.updated
+            RETURNING version
+            ''',
+            (*key, orjson.dumps(data).decode(), time.time())
+        ).fetchone()[0]
+
+    @timed(sqlite_duration, "store_write")
+    def write(self, kind, data, school, grade, cls=None) -> int:
+        key = self._key(kind, school, grade, cls)
+        with self._lock, self._conn:
+            return self._upsert(key, data)
+
+    @timed(sqlite_duration, "store_write_many")
+    def write_many(self, items: Iterable[tuple[str, str, str, str | None, dict]]) -> int:
+        """
+        在同一个事务中写入多个文档，任一失败则全部回滚
+        :param items: (kind, school, grade, cls, data)
+        :return: 写入的文档数量
+        """
+        count = 0
+        with self._lock, self._conn:
+            for kind, school, grade, cls, data in items:
+                self._upsert(self._key(kind, school, grade, cls), data)
+                count += 1
+        return count
+
+    def exists(self, kind, school, grade, cls=None) -> bool:
+        return self.version(kind, school, grade, cls) > 0
+
+    def version(self, kind, school, grade, cls=None) -> int:
+        key = self._key(kind, school, grade, cls)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM documents WHERE school = ? AND grade = ? AND cls = ? AND kind = ?", key
+            ).fetchone()
+        return 0 if row is None else row[0]
+
+    def _distinct(self, column: str, where: str = "", params: tuple = ()) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT {column} FROM documents {where}", params).fetchall()
+        return sorted((r[0] for r in rows if r[0]), key=sort_key)
+
+    def schools(self) -> list[str]:
+        return self._distinct("school")
+
+    def grades(self, school) -> list[str]:
+        return self._distinct("grade", "WHERE school = ?", (str(school),))
+
+    def classes(self, school, grade) -> list[str]:
+        return self._distinct("cls", "WHERE school = ? AND grade = ?", (str(school), str(grade)))
+
+    def documents(self) -> Iterator[tuple[str, str, str, str | None, dict]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, school, grade, cls, data FROM documents").fetchall()
+        for kind, school, grade, cls, data in rows:
+            yield kind, school, grade, cls or None, orjson.loads(data)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,96 @@
+import datetime
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.calc import from_str_to_date, weeks
+
+# 表格覆盖 [开学前一周, 今天 + HORIZON 天)
+HORIZON = 400
+
+
+@dataclass(frozen=True)
+class Day:
+    date: datetime.date
+    week: int  # 第几周（与 calc.weeks 一致，开学前为 0 或负数）
+
+    def cycle(self, length: int) -> int:
+        """
+        单双周等循环中的位置
+        :param length: 循环长度
+        """
+        return (self.week - 1) % length
+
+
+class CalendarTable:
+    """
+    某个开学日期下的校历表：按天存储周数，查询为 O(1)
+    节假日与调休由 calc.compensation_index 统一查询，此处不重复存储
+    """
+
+    def __init__(self, start: datetime.date, today: datetime.date):
+        self.start = start
+        self.built_on = today
+        self.first = start - datetime.timedelta(days=7)
+        length = max((today - self.first).days, 0) + HORIZON
+        self.week = array("h", (weeks(start, self.first + datetime.timedelta(days=offset)) for offset in range(length)))
+
+    def __len__(self) -> int:
+        return len(self.week)
+
+    def lookup(self, date: datetime.date) -> Optional[Day]:
+        offset = (date - self.first).days
+        if not 0 <= offset < len(self.week):
+            return None
+        return Day(date=date, week=self.week[offset])
+
+
+# 开学日期 -> 校历表；各年级开学日期相同时共用一张表
+_tables: dict[datetime.date, CalendarTable] = {}
+_lock = threading.Lock()
+
+
+def table(start: datetime.date | str) -> CalendarTable:
+    """
+    获取某个开学日期的校历表，开学日期变化或日期翻页后自动重建
+    :param start: 开学日期，如 2025-09-01
+    """
+    if isinstance(start, str):
+        start = from_str_to_date(start)
+    today = datetime.date.today()
+    current = _tables.get(start)
+    if current is not None and current.built_on == today:
+        return current
+    with _lock:
+        current = _tables.get(start)
+        if current is None or current.built_on != today:
+            current = CalendarTable(start, today)
+            # 过期的表不会再被查询，顺便清理
+            for key in [k for k, v in _tables.items() if v.built_on != today]:
+                _tables.pop(key)
+            _tables[start] = current
+    return current
+
+
+def day(start: datetime.date | str, date: datetime.date | None = None) -> Day:
+    """
+    查询某天的校历信息，超出表格范围时现场计算
+    :param start: 开学日期
+    :param date: 查询日期，默认为今天
+    """
+    calendar = table(start)
+    date = date or datetime.date.today()
+    result = calendar.lookup(date)
+    if result is None:
+        result = Day(date=date, week=weeks(calendar.start, date))
+    return result
+
+
+def week_of(start: datetime.date | str, date: datetime.date | None = None) -> int:
+    """
+    查询某天是开学后的第几周
+    :param start: 开学日期
+    :param date: 查询日期，默认为今天
+    """
+    return day(start, date).week
@@ -0,0 +1,197 @@
+"""
+持久化的计数型统计（天气错误、异常断开、请求量等）
+- record 只在内存中累加，定时批量写入 SQLite，不阻塞事件循环
+- 写入时同时累加到小时表与日表（即写入时完成汇总），查询趋势无需扫描明细
+- 小时表保留较短时间，日表长期保留，可查看数周乃至数月的趋势
+"""
+import asyncio
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from loguru import logger
+
+from utils.config import config
+
+Key = tuple[int, str, str, str]  # (小时起始时间戳, 日期, 指标, 标签)
+
+_buffer: dict[Key, float] = {}
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+_flush_lock = asyncio.Lock()
+
+
+def init():
+    """
+    打开数据库并建表
+    """
+    global _conn
+    os.makedirs(os.path.dirname(config.stats.database) or ".", exist_ok=True)
+    conn = sqlite3.connect(config.stats.database, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hourly (
+            hour INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            label TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (metric, hour, label)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily (
+            day TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            label TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (metric, day, label)
+        )
+    ''')
+    conn.commit()
+    _conn = conn
+
+
+def record(metric: str, label: str = "", value: float = 1.0):
+    """
+    累加一个计数（仅写入内存，由 flush 定时落盘）
+    :param metric: 指标名称，如 websocket_disconnect
+    :param label: 标签，如班级 39/2023/1；为空表示总量
+    :param value: 增量
+    """
+    now = time.time()
+    hour = int(now // 3600 * 3600)
+    day = datetime.date.fromtimestamp(now).isoformat()
+    key = (hour, day, metric, label)
+    _buffer[key] = _buffer.get(key, 0.0) + value
+
+
+def _write(items: list[tuple[Key, float]]):
+    with _lock, _conn:
+        _conn.executemany(
+            '''
+            INSERT INTO hourly (hour, metric, label, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (metric, hour, label) DO UPDATE SET value = hourly.value + excluded.value
+            ''',
+            [(hour, metric, label, value) for (hour, _, metric, label), value in items]
+        )
+        _conn.executemany(
+            '''
+            INSERT INTO daily (day, metric, label, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (metric, day, label) DO UPDATE SET value = daily.value + excluded.value
+            ''',
+            [(day, metric, label, value) for (_, day, metric, label), value in items]
+        )
+
+
+async def flush():
+    """
+    将内存中累加的计数批量写入数据库（定时调用，程序关闭时也会调用）
+    """
+    if _conn is None or not _buffer:
+        return
+    async with _flush_lock:
+        items = list(_buffer.items())
+        _buffer.clear()
+        try:
+            await asyncio.to_thread(_write, items)
+        except Exception as err:
+            # 写回内存，下次重试
+            for key, value in items:
+                _buffer[key] = _buffer.get(key, 0.0) + value
+            logger.exception(f"写入统计数据失败：{err}")
+
+
+def _prune():
+    hour = time.time() - config.stats.hourly_retention * 86400
+    day = (datetime.date.today() - datetime.timedelta(days=config.stats.daily_retention)).isoformat()
+    with _lock, _conn:
+        hourly = _conn.execute("DELETE FROM hourly WHERE hour < ?", (hour,)).rowcount
+        daily = _conn.execute("DELETE FROM daily WHERE day < ?", (day,)).rowcount
+    logger.info(f"已清理过期的统计数据：小时 {hourly} 条，日 {daily} 条")
+
+
+async def prune():
+    """
+    删除超过保留期限的小时与日统计
+    """
+    if _conn is not None:
+        await asyncio.to_thread(_prune)
+
+
+def _query(sql: str, params: tuple) -> list[tuple]:
+    with _lock:
+        return _conn.execute(sql, params).fetchall()
+
+
+def today(metric: str) -> dict[str, float]:
+    """
+    今日已落盘的各标签计数（启动时用于恢复当天的统计）
+    """
+    rows = _query(
+        "SELECT label, value FROM daily WHERE metric = ? AND day = ?", (metric, datetime.date.today().isoformat())
+    )
+    return dict(rows)
+
+
+def trend(
+        metric: str, granularity: str, start: datetime.date, end: datetime.date, label: str | None = None
+) -> dict[str, list[dict]]:
+    """
+    按小时或按天的趋势
+    :param metric: 指标名称
+    :param granularity: hour 或 day
+    :param start: 起始日期（含）
+    :param end: 结束日期（含）
+    :param label: 仅查询该标签，为空时查询全部标签
+    :return: 标签 -> [{"time", "value"}]，按时间升序
+    """
+    where, params = "", ()
+    if label is not None:
+        where, params = " AND label = ?", (label,)
+    if granularity == "hour":
+        begin = time.mktime(start.timetuple())
+        finish = time.mktime((end + datetime.timedelta(days=1)).timetuple())
+        rows = _query(
+            f"SELECT hour, label, value FROM hourly WHERE metric = ? AND hour >= ? AND hour < ?{where} ORDER BY hour",
+            (metric, begin, finish, *params)
+        )
+        rows = [(datetime.datetime.fromtimestamp(h).isoformat(timespec="minutes"), l, v) for h, l, v in rows]
+    else:
+        rows = _query(
+            f"SELECT day, label, value FROM daily WHERE metric = ? AND day >= ? AND day <= ?{where} ORDER BY day",
+            (metric, start.isoformat(), end.isoformat(), *params)
+        )
+    series: dict[str, list[dict]] = {}
+    for moment, row_label, value in rows:
+        series.setdefault(row_label, []).append({"time": moment, "value": value})
+    return series
+
+
+def top(metric: str, start: datetime.date, end: datetime.date, limit: int) -> list[dict]:
+    """
+    区间内各标签的汇总，按出现天数、总数降序（用于找出长期频繁断线的班级）
+    """
+    rows = _query(
+        '''
+        SELECT label, SUM(value) AS total, COUNT(*) AS days, MAX(day) AS last
+        FROM daily WHERE metric = ? AND day >= ? AND day <= ? AND label != ''
+        GROUP BY label ORDER BY days DESC, total DESC LIMIT ?
+        ''',
+        (metric, start.isoformat(), end.isoformat(), limit)
+    )
+    return [{"label": l, "total": t, "days": d, "last": last} for l, t, d, last in rows]
+
+
+def stats() -> dict:
+    return {"buffered": len(_buffer)}
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        with _lock:
+            _conn.close()
+        _conn = None
@@ -0,0 +1,124 @@
+"""
+轻量的请求内分段计时
+- 每个 HTTP 请求开始时创建 Trace，经 contextvars 传递，同一请求内的协程与 to_thread 线程都能记录分段
+- 响应时将分段写入 Server-Timing 头，浏览器开发者工具可直接查看
+- 按采样率将完整的分段记录追加到 JSONL 文件，便于离线分析
+"""
+import asyncio
+import contextvars
+import datetime
+import random
+import time
+
+import orjson
+from loguru import logger
+
+from utils.config import config
+from utils.metrics import Histogram
+
+_current: contextvars.ContextVar["Trace | None"] = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: list[tuple[str, float, float]] = []  # (名称, 相对请求开始的时间, 耗时)，单位为秒
+
+    def add(self, name: str, start: float, duration: float):
+        self.spans.append((name, start - self.start, duration))
+
+    def server_timing(self, total: float) -> str:
+        entries = [f"{name};dur={duration * 1000:.2f}" for name, _, duration in self.spans]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class span:
+    """
+    记录一个分段：with span("resolve_all"): ...
+    不在请求内（如定时任务）时只记录到 histogram
+    """
+    __slots__ = ("name", "histogram", "start")
+
+    def __init__(self, name: str, histogram: Histogram | None = None):
+        self.name = name
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        duration = time.perf_counter() - self.start
+        trace = _current.get()
+        if trace is not None:
+            trace.add(self.name, self.start, duration)
+        if self.histogram is not None:
+            self.histogram.observe(duration, self.name)
+
+
+def add(name: str, start: float):
+    """
+    记录从 start（time.perf_counter()）到现在的分段，用于无法用 with 包裹的等待（如排队）
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+def _append(line: bytes):
+    with open(config.trace.file, "ab") as file:
+        file.write(line)
+
+
+class TraceMiddleware:
+    """
+    为每个 HTTP 请求创建 Trace，响应头中附带 Server-Timing，并按采样率写入 JSONL
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+        status = 500
+        total = 0.0
+
+        async def send_wrapper(message):
+            nonlocal status, total
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - trace.start
+                if trace.spans and config.trace.server_timing:
+                    headers = [*message.get("headers", []), (b"server-timing", trace.server_timing(total).encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+        if trace.spans and config.trace.sample_rate > 0 and random.random() < config.trace.sample_rate:
+            route = getattr(scope.get("route"), "path", None)
+            line = orjson.dumps({
+                "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "total": round(total * 1000, 3),
+                "spans": [
+                    {"name": name, "start": round(start * 1000, 3), "dur": round(duration * 1000, 3)}
+                    for name, start, duration in trace.spans
+                ],
+            }) + b"\n"
+            try:
+                await asyncio.to_thread(_append, line)
+            except OSError as err:
+                logger.warning(f"写入追踪记录失败：{err}")
@@ -0,0 +1,125 @@
+import datetime
+import hashlib
+import threading
+from typing import Any
+
+import orjson
+
+from utils.db import fetch_records, records_version
+from utils.schedule.helpers import parse_scope_field
+from utils.store import CLASS_DOCUMENTS, GRADE_DOCUMENTS, DocumentNotFound, store
+
+# 文档或作用域 -> (内容哈希, 版本号)；哈希相同表示内容相同，版本号在本进程内单调递增
+_documents: dict[tuple[str, str, str, str | None], tuple[str, int]] = {}
+# 文档 -> 上次计算哈希时的 (后端版本号, 写缓冲代数)，未变化时无需重新读取文档
+_stamps: dict[tuple[str, str, str, str | None], tuple[int, int]] = {}
+_scopes: dict[str, tuple[str, int]] = {}
+# (records 表版本号, autorun_scopes 的结果)，版本号未变化时无需重新读取与哈希全部规则
+_autorun: tuple[int, dict[str, dict]] | None = None
+_lock = threading.Lock()
+# 课表接口实际读取的文档，合并哈希（即课表的 ETag）只包含这些；weather 等文档变化不影响课表内容
+SCHEDULE_DOCUMENTS = ("subjects", "timetable", "config", "schedule")
+
+
+def content_hash(value: Any) -> str:
+    return hashlib.blake2b(orjson.dumps(value, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+
+def _bump(table: dict, key, digest: str, floor: int = 0) -> dict:
+    with _lock:
+        previous = table.get(key)
+        if previous is None:
+            version = max(floor, 1)
+        elif previous[0] != digest:
+            version = max(floor, previous[1] + 1)
+        else:
+            version = max(floor, previous[1])
+        table[key] = (digest, version)
+    return {"hash": digest, "version": version}
+
+
+def document(kind: str, school: str | int, grade: str | int, cls: str | int | None = None) -> dict | None:
+    """
+    文档的内容哈希与版本号，文档不存在时返回 None
+    版本号不小于存储后端自身的版本号（SQLite 为写入次数，JSON 为文件修改时间），因此多个 worker 之间也可比较
+    """
+    key = (kind, str(school), str(grade), None if cls is None else str(cls))
+    stamp = (store.version(kind, school, grade, cls), store.generation(kind, school, grade, cls))
+    if _stamps.get(key) == stamp and key in _documents:
+        digest, version = _documents[key]
+        return {"hash": digest, "version": version}
+    try:
+        data = store.read(kind, school, grade, cls)
+    except DocumentNotFound:
+        return None
+    result = _bump(_documents, key, content_hash(data), stamp[0])
+    _stamps[key] = stamp
+    return result
+
+
+def autorun_scopes() -> dict[str, dict]:
+    """
+    各作用域下自动任务规则集合的内容哈希与版本号
+    :return: 作用域（ALL、学校、学校/年级、学校/年级/班级） -> {"hash", "version"}
+    """
+    global _autorun
+    stamp = records_version()
+    cached = _autorun
+    if cached is not None and cached[0] == stamp:
+        return dict(cached[1])
+    rules: dict[str, list[dict]] = {}
+    for row in fetch_records():
+        for scope in parse_scope_field(row.get("scope")) or ["ALL"]:
+            scope = "ALL" if scope.strip().upper() == "ALL" else scope.strip()
+            rules.setdefault(scope, []).append(row)
+    result = {
+        scope: _bump(_scopes, scope, content_hash(sorted(rows, key=lambda r: r["hashid"])))
+        for scope, rows in rules.items()
+    }
+    with _lock:
+        # 已被清空的作用域
+        for scope in set(_scopes) - set(result):
+            previous = _scopes[scope]
+            if previous[0] != "":
+                _scopes[scope] = ("", previous[1] + 1)
+            result[scope] = {"hash": "", "version": _scopes[scope][1]}
+        _autorun = (stamp, result)
+    return dict(result)
+
+
+def _applicable(scope: str, school: str, grade: str, cls: str) -> bool:
+    return scope == "ALL" or scope in (school, f"{school}/{grade}", f"{school}/{grade}/{cls}")
+
+
+def class_versions(school: str | int, grade: str | int, class_number: str | int) -> dict:
+    """
+    某班级全部文档与自动任务的版本信息，以及课表所依赖输入的合并哈希（含当天日期，因为单双周、调休等解析结果随日期变化）
+    """
+    school, grade, cls = str(school), str(grade), str(class_number)
+    documents = {kind: document(kind, school, grade) for kind in GRADE_DOCUMENTS}
+    documents.update({kind: document(kind, school, grade, cls) for kind in CLASS_DOCUMENTS})
+    autorun = {scope: v for scope, v in autorun_scopes().items() if _applicable(scope, school, grade, cls)}
+    today = datetime.date.today().isoformat()
+    combined = content_hash({
+        "date": today,
+        "documents": {kind: documents[kind] and documents[kind]["hash"] for kind in SCHEDULE_DOCUMENTS},
+        "autorun": {k: v["hash"] for k, v in autorun.items()},
+    })
+    return {"date": today, "hash": combined, "documents": documents, "autorun": autorun}
+
+
+def all_versions() -> dict:
+    """
+    所有文档与自动任务作用域的版本信息
+    """
+    documents = {}
+    for school, grades in store.tree().items():
+        for grade, classes in grades.items():
+            for kind in GRADE_DOCUMENTS:
+                if (v := document(kind, school, grade)) is not None:
+                    documents[f"{school}/{grade}/{kind}"] = v
+            for cls in classes:
+                for kind in CLASS_DOCUMENTS:
+                    if (v := document(kind, school, grade, cls)) is not None:
+                        documents[f"{school}/{grade}/{cls}/{kind}"] = v
+    return {"documents": documents, "autorun": autorun_scopes()}
@@ -1,7 +1,93 @@
-import aiohttp
+import asyncio
+import random
+
+import time
+from collections import OrderedDict
+
+import orjson
 from loguru import logger
 
-cache = {}
+from utils import clients, db
+from utils.breaker import CircuitBreaker, CircuitOpen
+from utils.cache import AsyncTTLCache
+from utils.config import config
+from utils.globalvar import websocket_clients
+from utils.store import DocumentNotFound, store
+
+class CityCache:
+    """
+    城市 ID 缓存：有大小上限的 LRU，写入 SQLite 持久化并在启动时按最近使用预热（命中时间在内存中累积，定时批量写入）；
+    不存在的城市同样会被缓存（负缓存），在 negative_ttl 内不会再次访问上游
+    """
+    MISS = object()
+
+    def __init__(self, maxsize: int, negative_ttl: float):
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[tuple[str, str | None], tuple[str | None, float]] = OrderedDict()
+        self._touched: dict[tuple[str, str | None], float] = {}  # 尚未写入的命中时间
+
+    def get(self, key: tuple[str, str | None]):
+        """
+        :return: 城市 ID；城市不存在时返回 None；未缓存（或负缓存已过期）时返回 CityCache.MISS
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return self.MISS
+        city_id, updated = entry
+        if city_id is None and time.time() - updated > self.negative_ttl:
+            del self._entries[key]
+            return self.MISS
+        self._entries.move_to_end(key)
+        self._touched[key] = time.time()
+        return city_id
+
+    def _put(self, key: tuple[str, str | None], city_id: str | None, updated: float):
+        self._entries[key] = (city_id, updated)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def set(self, key: tuple[str, str | None], city_id: str | None):
+        updated = time.time()
+        self._put(key, city_id, updated)
+        try:
+            await asyncio.to_thread(db.save_city_cache, key[0], key[1], city_id, updated, self.maxsize)
+        except Exception as err:
+            logger.warning(f"持久化城市 ID 缓存失败：{err}")
+
+    async def flush(self):
+        """
+        将累积的命中时间批量写入 SQLite（定时任务与关闭时调用）
+        """
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        try:
+            await asyncio.to_thread(db.touch_city_cache, [(name, adm, used) for (name, adm), used in touched.items()])
+        except Exception as err:
+            logger.warning(f"写入城市 ID 缓存的命中时间失败：{err}")
+
+    async def warm(self):
+        """
+        从 SQLite 读取最近使用的城市 ID，预热缓存
+        """
+        rows = await asyncio.to_thread(db.load_city_cache, self.maxsize)
+        for name, adm, city_id, updated in reversed(rows):
+            self._put((name, adm), city_id, updated)
+        logger.info(f"已预热 {len(rows)} 条城市 ID 缓存")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# (城市名称, 省份名称) -> 城市 ID
+cache = CityCache(maxsize=config.weather.city_cache_size, negative_ttl=config.weather.negative_ttl)
+# (城市名称, 省份名称) -> 天气与预警的合并结果
+report_cache = AsyncTTLCache(ttl=config.weather.ttl, stale_ttl=config.weather.stale)
+breaker = CircuitBreaker(
+    "weather", failure_threshold=config.weather.failure_threshold, reset_timeout=config.weather.reset_timeout
+)
 
 async def city_lookup(name, key, host, adm=None):
     """
@@ -11,20 +97,29 @@ async def city_lookup(name, key, host, adm=None):
     :param key: APIKEY
     :param adm: 省份名称
     :return: 城市 ID
+    :raise KeyError: 城市不存在
     """
-    if (name, adm) in cache:
-        logger.info(f"Cache hit: {name = }, {adm = } -> {cache[(name, adm)]}")
-        return cache[(name, adm)]
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-                f"https://{host}/geo/v2/city/lookup?"
-                f"location={name}&" + (f"&adm={adm}" if adm else ""),
-                headers={
-                    'X-QW-Api-Key': key
-                }
-        ) as response:
-            cache[(name, adm)] = (await response.json())["location"][0]["id"]
-            return cache[(name, adm)]
+    city_id = cache.get((name, adm))
+    if city_id is not CityCache.MISS:
+        logger.info(f"Cache hit: {name = }, {adm = } -> {city_id}")
+        if city_id is None:
+            raise KeyError(name)
+        return city_id
+    async with clients.session().get(
+            f"https://{host}/geo/v2/city/lookup?"
+            f"location={name}&" + (f"&adm={adm}" if adm else ""),
+            headers={
+                'X-QW-Api-Key': key
+            }
+    ) as response:
+        data = await response.json()
+    if data.get("code") == "404" or (data.get("code") == "200" and not data.get("location")):
+        await cache.set((name, adm), None)
+        raise KeyError(name)
+    if "location" not in data:
+        raise RuntimeError(f"GeoAPI 返回异常状态码：{data.get('code')}")
+    await cache.set((name, adm), data["location"][0]["id"])
+    return data["location"][0]["id"]
 
 
 async def weather_lookup(location, key, host):
@@ -35,15 +130,14 @@ async def weather_lookup(location, key, host):
     :param key: APIKEY
     :return: API 所返回的 JSON 数据
     """
-    async with (aiohttp.ClientSession() as session):
-        async with session.get(
-            f"https://{host}/v7/weather/now?"
-            f"location={location}",
-            headers={
-                'X-QW-Api-Key': key
-            }
-        ) as response:
-            return await response.json()
+    async with clients.session().get(
+        f"https://{host}/v7/weather/now?"
+        f"location={location}",
+        headers={
+            'X-QW-Api-Key': key
+        }
+    ) as response:
+        return await response.json()
 
 
 async def weather_warning_lookup(location, key, host):
@@ -54,15 +148,14 @@ async def weather_warning_lookup(location, key, host):
     :param key: APIKEY
     :return: API 所返回的 JSON 数据
     """
-    async with (aiohttp.ClientSession() as session):
-        async with session.get(
-            f"https://{host}/v7/warning/now?"
-            f"location={location}",
-            headers={
-                'X-QW-Api-Key': key
-            }
-        ) as response:
-            return await response.json()
+    async with clients.session().get(
+        f"https://{host}/v7/warning/now?"
+        f"location={location}",
+        headers={
+            'X-QW-Api-Key': key
+        }
+    ) as response:
+        return await response.json()
 
 async def weather_lookup_by_name(name, key, host, adm=None):
     """
@@ -94,3 +187,151 @@ async def weather_warning_lookup_by_name(name, key, host, adm=None):
         host=host,
         key=key
     )
+
+
+async def weather_report(name, key, host, adm=None) -> dict[str, str]:
+    """
+    获取某个城市的天气与预警（两者并发请求），并合并为客户端所需的格式
+    :param host: API Host
+    :param name: 城市名称
+    :param key: APIKEY
+    :param adm: 省份名称
+    :return: {"temp": 温度, "weat": 天气, "warn": 预警全文, "brief_warn": 预警标题}
+    """
+    location = await city_lookup(name, key, host, adm)
+    tasks = [
+        asyncio.ensure_future(weather_lookup(location=location, host=host, key=key)),
+        asyncio.ensure_future(weather_warning_lookup(location=location, host=host, key=key)),
+    ]
+    try:
+        resp, warn_resp = await asyncio.gather(*tasks)
+    except BaseException:
+        # 一个请求失败时取消另一个，避免重试时与新一轮请求同时访问上游；不用 TaskGroup 以保留原异常类型（如 KeyError）
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return {
+        "temp": resp['now']['temp'],
+        "weat": resp['now']['text'],
+        "warn": '；'.join([x['text'] for x in warn_resp['warning']]).replace('\n', ''),
+        "brief_warn": '；'.join([x['title'] for x in warn_resp['warning']]).replace('\n', ''),
+    }
+
+
+async def _weather_report_with_retry(name, key, host, adm=None) -> dict[str, str]:
+    """
+    带重试的 weather_report：指数退避（带随机抖动），所有尝试共享一个总时限；城市不存在（KeyError）不重试
+    熔断器只在真正访问上游时检查，命中缓存的请求不会占用半开状态下唯一的试探机会
+    """
+    if not breaker.allow():
+        raise CircuitOpen(f"天气熔断器已打开，暂不获取 {adm}/{name} 的天气")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.weather.deadline
+    delay = config.weather.backoff
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            report = await asyncio.wait_for(
+                weather_report(name=name, key=key, host=host, adm=adm),
+                timeout=max(deadline - loop.time(), 0.01)
+            )
+        except KeyError:
+            breaker.success()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as err:
+            remaining = deadline - loop.time()
+            if attempt >= config.weather.retries or remaining <= delay:
+                breaker.failure()
+                raise
+            logger.warning(f"获取 {adm}/{name} 的天气信息失败（第 {attempt} 次）：{err!r}，{delay:.2f} 秒后重试")
+            try:
+                await asyncio.sleep(delay * (1 + random.random() * 0.5))
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            delay *= 2
+            continue
+        breaker.success()
+        return report
+
+
+async def cached_weather_report(name, key, host, adm=None) -> dict[str, str]:
+    """
+    带缓存的 weather_report：同一城市的并发请求只会访问一次上游，过期后的 stale 时间内先返回旧值再后台刷新
+    （上游故障时后台刷新失败，旧值继续可用）；超过 ttl + stale 的结果已不能代表当前天气，此时上游故障直接抛出异常
+    """
+    return await report_cache.get(
+        (name, adm),
+        lambda: _weather_report_with_retry(name=name, key=key, host=host, adm=adm)
+    )
+
+
+def read_class_city(school: str, grade: int | str, class_number: int | str) -> tuple[str, str | None] | None:
+    """
+    读取班级所在城市（班级的 weather 文档），未配置时返回 None
+    :return: (城市名称, 省份名称)
+    """
+    try:
+        data = store.read("weather", school, grade, class_number)
+    except DocumentNotFound:
+        return None
+    return data['name'], data.get('province') or None
+
+
+def _collect_cities() -> dict[tuple[str, str | None], list[tuple[str, int, int]]]:
+    """
+    同步实现：收集已连接班级所在的城市，(城市名称, 省份名称) -> [(school, grade, class_number)]
+    """
+    cities: dict[tuple[str, str | None], list[tuple[str, int, int]]] = {}
+    for (school, grade), mgr in list(websocket_clients.items()):
+        for class_number in {c for (_s, _g, c) in list(mgr.class_map)}:
+            try:
+                city = read_class_city(school, grade, class_number)
+            except Exception as err:
+                logger.warning(f"读取 {school} 学校 {grade} 级 {class_number} 班的城市配置失败：{err}")
+                continue
+            if city is not None:
+                cities.setdefault(city, []).append((school, grade, class_number))
+    return cities
+
+
+async def prefetch():
+    """
+    定时任务：为已连接班级所在的城市刷新天气缓存（每个城市一次上游请求），并按配置推送给协议 2 的客户端
+    """
+    cities = await asyncio.to_thread(_collect_cities)
+    if not cities:
+        return
+    logger.info(f"预取 {len(cities)} 个城市的天气")
+    for (name, adm), classes in cities.items():
+        try:
+            report = await report_cache.refresh(
+                (name, adm),
+                lambda: _weather_report_with_retry(
+                    name=name, key=config.apikey.weather, host=config.apikey.apihost, adm=adm
+                )
+            )
+        except CircuitOpen:
+            logger.warning("天气熔断器已打开，跳过本轮预取")
+            return
+        except Exception as err:
+            logger.warning(f"预取 {adm}/{name} 的天气失败：{err!r}")
+            continue
+        if config.weather.push:
+            await _push(report, classes)
+
+
+async def _push(report: dict[str, str], classes: list[tuple[str, int, int]]):
+    message = orjson.dumps({"event": "Weather", "data": report}).decode()
+    for school, grade, class_number in classes:
+        mgr = websocket_clients.get((school, grade))
+        if mgr is None:
+            continue
+        for connection in mgr.get_connections(class_number):
+            if mgr.get_class_object(connection).protocol >= 2:
+                await mgr.send_personal_message(message, connection, kind="Weather")
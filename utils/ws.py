@@ -1,8 +1,16 @@
+import asyncio
+import time
+from collections import deque
 from dataclasses import dataclass
 
+import orjson
 from fastapi import WebSocket
 from loguru import logger
 
+from utils import metrics
+from utils.config import config
+from utils.refresh import planner
+
 
 @dataclass
 class ClassObject:
@@ -10,20 +18,108 @@ class ClassObject:
     grade: int
     class_number: int
     debug: bool = False
+    protocol: int = 1  # 1: 纯文本消息；2: JSON 消息，SyncConfig 附带刷新延迟
+
+# 只需保留最新一条的消息类型
+COLLAPSIBLE = {"SyncConfig", "Weather"}
+# 正在关闭连接的任务，事件循环只持有任务的弱引用，需在完成前保留
+_closing: set[asyncio.Task] = set()
+
+class Outbox:
+    """
+    单个连接的有界发送队列，由独立的写任务负责发送，慢速的客户端不会拖慢广播，也不会无限占用内存
+    """
+
+    def __init__(self, websocket: WebSocket, maxsize: int, policy: str):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue: deque[tuple[str, str]] = deque()  # (消息类型, 消息文本)
+        self.sent = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    def put(self, kind: str, text: str) -> bool:
+        """
+        将消息放入发送队列
+        :param kind: 消息类型，如 SyncConfig
+        :param text: 消息文本
+        :return: 是否成功入队
+        """
+        if self.closed:
+            return False
+        if self.policy == "collapse" and kind in COLLAPSIBLE:
+            for index, (k, _) in enumerate(self.queue):
+                if k == kind:
+                    # 已有未发送的同类消息，用新消息替换即可
+                    self.queue[index] = (kind, text)
+                    self.collapsed += 1
+                    return True
+        if len(self.queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                logger.warning(f"连接发送队列已满（{len(self.queue)}），断开该连接")
+                self.dropped += len(self.queue) + 1
+                metrics.outbox_dropped.inc(self.policy, amount=len(self.queue) + 1)
+                self.queue.clear()
+                task = asyncio.create_task(self.close(code=1013))
+                _closing.add(task)
+                task.add_done_callback(_closing.discard)
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+            metrics.outbox_dropped.inc(self.policy)
+        self.queue.append((kind, text))
+        self._ready.set()
+        return True
+
+    async def _writer(self):
+        while True:
+            while not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+            _, text = self.queue.popleft()
+            try:
+                await self.websocket.send_text(text)
+                self.sent += 1
+            except Exception as err:
+                logger.debug(f"发送 WebSocket 消息失败，停止该连接的写任务：{err}")
+                self.closed = True
+                self.queue.clear()
+                return
+
+    async def close(self, code: int = 1000):
+        """
+        关闭连接，接收循环随后会收到 WebSocketDisconnect 并完成清理
+        """
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception as err:
+            logger.debug(f"关闭 WebSocket 连接失败：{err}")
+
+    def stop(self):
+        self.closed = True
+        self._task.cancel()
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
         self.ws_map: dict[WebSocket, ClassObject] = {}
         self.class_map: list[tuple[str, int, int]] = []
+        self.outboxes: dict[WebSocket, Outbox] = {}
 
-    async def connect(self, websocket: WebSocket, school: str, grade: int, class_number: int):
+    async def connect(self, websocket: WebSocket, school: str, grade: int, class_number: int, protocol: int = 1):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.outboxes[websocket] = Outbox(websocket, config.websocket.queue_size, config.websocket.overflow)
         if (school, grade, class_number) not in self.class_map:
-            self.ws_map[websocket] = ClassObject(school, grade, class_number)
+            self.ws_map[websocket] = ClassObject(school, grade, class_number, protocol=protocol)
         else:
-            self.ws_map[websocket] = ClassObject(school, grade, class_number, debug=True)
+            self.ws_map[websocket] = ClassObject(school, grade, class_number, debug=True, protocol=protocol)
             logger.warning(
                 f"出现了一个 {school} 学校 {grade} 级 {class_number} 班的重复连接，可能是某地正在调试，"
                 f"该连接发生的所有操作均不会计入统计。"
@@ -36,14 +132,71 @@ class ConnectionManager:
             (self.ws_map[websocket].school, self.ws_map[websocket].grade, self.ws_map[websocket].class_number)
         )
         self.ws_map.pop(websocket)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.stop()
 
-    @staticmethod
-    async def send_personal_message(message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    async def send_personal_message(self, message: str, websocket: WebSocket, kind: str = ""):
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            await websocket.send_text(message)
+            return
+        outbox.put(kind or message, message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        kind = "SyncConfig" if message == "SyncConfig" else "other"
+        metrics.broadcast_fanout.inc(kind, amount=len(self.active_connections))
+        with metrics.broadcast_duration.time(kind):
+            if message == "SyncConfig":
+                await self._broadcast_sync_config()
+                return
+            for connection in self.active_connections:
+                await self.send_personal_message(message, connection)
+
+    async def _broadcast_sync_config(self):
+        """
+        广播 SyncConfig：协议 2 的连接会收到错开的刷新延迟，避免所有客户端在同一时刻重新拉取课表
+        """
+        connections = list(self.active_connections)
+        delays = iter(planner.allocate(
+            sum(1 for c in connections if self.ws_map[c].protocol >= 2)
+        ))
+        now = time.time()
+        for connection in connections:
+            if self.ws_map[connection].protocol >= 2:
+                delay = next(delays)
+                await self.send_personal_message(
+                    orjson.dumps(
+                        {
+                            "event": "SyncConfig",
+                            "delay": int(delay * 1000),  # 毫秒
+                            "deadline": int((now + delay) * 1000)  # 毫秒时间戳
+                        }
+                    ).decode(),
+                    connection,
+                    kind="SyncConfig"
+                )
+            else:
+                await self.send_personal_message("SyncConfig", connection)
 
     def get_class_object(self, websocket: WebSocket) -> ClassObject:
-        return self.ws_map[websocket]
\ No newline at end of file
+        return self.ws_map[websocket]
+
+    def get_connections(self, class_number: int) -> list[WebSocket]:
+        return [ws for ws, obj in self.ws_map.items() if obj.class_number == class_number]
+
+    def queue_stats(self) -> list[dict]:
+        """
+        各连接发送队列的统计信息
+        """
+        return [
+            {
+                "class_number": self.ws_map[ws].class_number,
+                "debug": self.ws_map[ws].debug,
+                "depth": len(outbox.queue),
+                "sent": outbox.sent,
+                "dropped": outbox.dropped,
+                "collapsed": outbox.collapsed,
+            }
+            for ws, outbox in self.outboxes.items()
+        ]